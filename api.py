@@ -1,16 +1,16 @@
 from flask import Flask, request, jsonify
+import importlib.util
 import json
 import os
 import requests
 from flask_cors import CORS
-import stripe
 import csv
-import pandas as pd
 from dotenv import load_dotenv
 import jwt
-import smtplib
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
+from catalog_api import catalog_api, init_catalog_api
+from catalog_broadcast import CatalogBroadcast
+from claimed_profile_sync import ClaimedProfilesSync, convert_claimed_profile
+from player_catalog import BackgroundRefresher, PlayerCatalog, load_static_players
 
 # Load environment variables from .env file
 load_dotenv()
@@ -32,7 +32,20 @@ else:
     print("SUPABASE: Missing environment variables")
     SUPABASE_AVAILABLE = False
 
-stripe.api_key = os.getenv('STRIPE_SECRET_KEY')
+# Seconds before a Supabase request made off the request path gives up
+SUPABASE_TIMEOUT = float(os.getenv('SUPABASE_TIMEOUT', '5'))
+
+# Delta sync of claimed_profiles, with a full re-read every CLAIMED_PROFILES_FULL_SYNC_SECONDS
+claimed_profile_sync = ClaimedProfilesSync(
+    supabase_url, supabase_key, SUPABASE_TIMEOUT,
+    full_sync_interval=float(os.getenv('CLAIMED_PROFILES_FULL_SYNC_SECONDS', '3600'))
+)
+
+def get_stripe():
+    """Stripe SDK, imported on the first checkout instead of at boot"""
+    import stripe
+    stripe.api_key = os.getenv('STRIPE_SECRET_KEY')
+    return stripe
 
 # Membership price IDs (replace with your actual Stripe price IDs)
 MEMBERSHIP_PRICES = {
@@ -40,22 +53,29 @@ MEMBERSHIP_PRICES = {
     'yearly': os.getenv('STRIPE_YEARLY_PRICE_ID', 'price_yearly_placeholder'),
 }
 
-# Try to import YouTube highlights, but handle import errors gracefully
-try:
-    from backend.college.youtube_highlights import search_youtube_videos
-    YOUTUBE_AVAILABLE = True
-except ImportError as e:
-    print(f"YouTube highlights import failed: {e}")
-    YOUTUBE_AVAILABLE = False
-    # Create a dummy function that returns a simple response
-    def search_youtube_videos(player_name, club_name):
-        return [{
-            'title': f'{player_name} Highlights',
-            'video_url': f'https://www.youtube.com/results?search_query={player_name}+{club_name}+highlights',
-            'channel': 'YouTube Search',
-            'published_at': 'N/A',
-            'description': f'Search results for {player_name} from {club_name}'
-        }]
+# The YouTube helper pulls in googleapiclient, so it is imported on the first
+# highlights request; availability is checked without importing it
+YOUTUBE_AVAILABLE = importlib.util.find_spec('googleapiclient') is not None
+_youtube_search = None
+
+def search_youtube_videos(player_name, club_name):
+    global _youtube_search, YOUTUBE_AVAILABLE
+    if _youtube_search is None:
+        try:
+            from backend.college.youtube_highlights import search_youtube_videos as youtube_search
+            _youtube_search = youtube_search
+        except ImportError as e:
+            print(f"YouTube highlights import failed: {e}")
+            YOUTUBE_AVAILABLE = False
+            # Return a simple search link instead
+            return [{
+                'title': f'{player_name} Highlights',
+                'video_url': f'https://www.youtube.com/results?search_query={player_name}+{club_name}+highlights',
+                'channel': 'YouTube Search',
+                'published_at': 'N/A',
+                'description': f'Search results for {player_name} from {club_name}'
+            }]
+    return _youtube_search(player_name, club_name)
 
 app = Flask(__name__)
 CORS(app, origins=['*'], methods=['GET', 'POST', 'OPTIONS'], allow_headers=['Content-Type', 'Authorization'])
@@ -73,6 +93,12 @@ def root():
         'endpoints': [
             '/api/health',
             '/api/players',
+            '/api/players/<id>',
+            '/api/players/batch',
+            '/api/players/search',
+            '/api/players/facets',
+            '/api/autocomplete',
+            '/api/team-logos',
             '/api/youtube-highlights'
         ]
     })
@@ -87,7 +113,6 @@ ANDORRA_DATA_URL = 'https://raw.githubusercontent.com/AntoineLevyy/draftAI/main/
 NJCAA_D1_DATA_URL = 'https://raw.githubusercontent.com/AntoineLevyy/draftAI/main/backend/college/njcaa/njcaa_d1_players.json'
 NJCAA_D2_DATA_URL = 'https://raw.githubusercontent.com/AntoineLevyy/draftAI/main/backend/college/njcaa/njcaa_d2_players.json'
 NJCAA_D3_DATA_URL = 'https://raw.githubusercontent.com/AntoineLevyy/draftAI/main/backend/college/njcaa/njcaa_d3_players.json'
-TEAM_LOGOS_URL = 'https://raw.githubusercontent.com/AntoineLevyy/draftAI/main/backend/college/njcaa/team_logos.json'
 EFBET_LIGA_DATA_URL = 'https://raw.githubusercontent.com/AntoineLevyy/draftAI/main/backend/pro/efbet_liga_players_api.json'
 VTORA_LIGA_DATA_URL = 'https://raw.githubusercontent.com/AntoineLevyy/draftAI/main/backend/pro/vtora_liga_players_api.json'
 NATIONAL_LEAGUE_DATA_URL = 'https://raw.githubusercontent.com/AntoineLevyy/draftAI/main/backend/pro/national_league_players_api.json'
@@ -102,8 +127,6 @@ SPAIN_SEGUNDA_G4_DATA_URL = 'https://raw.githubusercontent.com/AntoineLevyy/draf
 SPAIN_SEGUNDA_G5_DATA_URL = 'https://raw.githubusercontent.com/AntoineLevyy/draftAI/main/backend/pro/spain_segunda_g5_players_api.json'
 CLEAN_CLAIMED_PLAYERS_JSON = 'backend/college/njcaa/clean_claimed_players.json'
 
-# Cache for loaded data
-_player_cache = {}
 
 def verify_jwt_token(token):
     """Verify JWT token and return user ID"""
@@ -124,14 +147,26 @@ def verify_jwt_token(token):
         return None
 
 def clear_player_cache():
-    """Clear the player cache to force fresh data loading"""
-    global _player_cache
-    _player_cache = {}
-
-def load_json(path):
-    import json
-    with open(path, 'r', encoding='utf-8') as f:
-        return json.load(f)
+    """Refresh the claimed profiles in the background; the catalog overlay is replaced if they changed"""
+    claimed_profiles.refresh_now()
+
+def patch_claimed_profiles(rows):
+    """
+    Write-through after a claimed_profiles insert or update: layer the rows
+    the database returned (Prefer: return=representation) over the catalog
+    right away, and broadcast them to the other workers. Only cached
+    responses the claims can appear in are dropped; the background refresh
+    that follows reconciles with the table.
+    """
+    try:
+        profiles = [convert_claimed_profile(row) for row in rows]
+        version = player_catalog.patch(profiles)
+        print(f"CATALOG: Snapshot v{version} patched with {len(profiles)} claimed profiles")
+        catalog_broadcast.publish(profiles)
+    except Exception as e:
+        # The write itself succeeded; the refresh below picks the rows up instead
+        print(f"ERROR: Failed to patch the catalog with claimed profiles: {e}")
+    clear_player_cache()
 
 def check_user_exists(user_id):
     """Check if a user exists in the auth.users table"""
@@ -140,251 +175,82 @@ def check_user_exists(user_id):
     return True  # Assume user exists and let the constraint handle it
 
 def fetch_claimed_profiles_from_db():
-    """Fetch claimed profiles from the database using direct HTTP requests"""
+    """
+    Claimed profiles from the database, converted to the player JSON format.
+
+    Runs on the claimed_profiles refresher thread, never inside a request.
+    Only rows changed since the last call are fetched (see
+    claimed_profile_sync.py); raises on failure so the refresher keeps
+    serving the last good result.
+    """
     if not SUPABASE_AVAILABLE:
-        print("WARNING: Supabase not configured, skipping database claimed profiles")
-        return []
-    
-    try:
-        # Make direct HTTP request to Supabase
-        headers = {
-            'apikey': supabase_key,
-            'Authorization': f'Bearer {supabase_key}',
-            'Content-Type': 'application/json'
-        }
-        
-        response = requests.get(f'{supabase_url}/rest/v1/claimed_profiles', headers=headers)
-        response.raise_for_status()
-        claimed_profiles = response.json() if response.json() else []
-        
-        # Convert database format to match JSON format
-        converted_profiles = []
-        for profile in claimed_profiles:
-            print(f"DEBUG: Raw database profile: {profile}")
-            print(f"DEBUG: original_player_id value: {profile.get('original_player_id')}")
-            print(f"DEBUG: All profile keys: {list(profile.keys())}")
-            converted_profile = {
-                'playerId': profile['original_player_id'],
-                'claimed': True,
-                'type': 'transfer',
-                'Name': profile['name'],
-                'Position': profile['position'],
-                'Current School': profile['current_school'],
-                'Division Transferring From': profile['division_transferring_from'],
-                'Email Address': profile['email_address'],
-                'Years of Eligibility Left': profile['years_of_eligibility_left'],
-                'GPA': str(profile['gpa']) if profile['gpa'] else '',
-                'Individual Awards': profile['individual_awards'] or '',
-                'College Accolades': profile['college_accolades'] or '',
-                'Highlights': profile['highlights'] or '',
-                'Full 90 min Game Link': profile['full_game_link'] or '',
-                'Height': profile['height'] or '',
-                'Weight (lbs)': profile['weight'] or '',
-                'Credit Hours Taken when you will transfer': profile['credit_hours_taken'] or '',
-                'Available': profile['available'] or '',
-                'Nationality': profile['nationality'] or '',
-                'Year of Birth': profile['year_of_birth'] or '',
-                'Finances': profile['finances'] or '',
-                'Why Player is Transferring': profile['why_player_is_transferring'] or '',
-                'photo_url': '',  # No photo URL in database for now
-                'claimed_at': profile['claimed_at'],
-                'claimed_by_user_id': profile['claimed_by_user_id']
-            }
-            converted_profiles.append(converted_profile)
-        
-        print(f"DEBUG: Loaded {len(converted_profiles)} claimed profiles from database")
-        return converted_profiles
-        
-    except Exception as e:
-        print(f"ERROR: Failed to fetch claimed profiles from database: {e}")
         return []
+    return claimed_profile_sync.sync()
 
-def get_all_players():
-    players = []
-    # Transfer - Claimed
-    for p in load_json('backend/college/njcaa/clean_claimed_players.json'):
-        p['claimed'] = True
-        p['type'] = 'transfer'
-        players.append(p)
-    # Transfer - Unclaimed
-    for fname in [
-        'backend/college/njcaa/njcaa_d1_players.json',
-        'backend/college/njcaa/njcaa_d2_players.json',
-        'backend/college/njcaa/njcaa_d3_players.json',
-    ]:
-        for p in load_json(fname):
-            p['claimed'] = False
-            p['type'] = 'transfer'
-            players.append(p)
-    # High School - Claimed (future)
-    # for p in load_json('backend/college/highschool/clean_claimed_highschool_players.json'):
-    #     p['claimed'] = True
-    #     p['type'] = 'highschool'
-    #     players.append(p)
-    # High School - Unclaimed
-    for p in load_json('backend/college/highschool/highschool_players.json'):
-        p['claimed'] = False
-        p['type'] = 'highschool'
-        p['source'] = 'json'
-        players.append(p)
-    print('DEBUG: Total players loaded:', len(players))
-    print('DEBUG: Claimed players loaded:', sum(1 for p in players if p.get('claimed')))
-    print('DEBUG: Unclaimed players loaded:', sum(1 for p in players if not p.get('claimed')))
-    return players
+def build_player_list():
+    """
+    Base player list: the local college and high school files.
 
-players = []
-
-# Transfer - Claimed
-for p in load_json('backend/college/njcaa/clean_claimed_players.json'):
-    p['claimed'] = True
-    p['type'] = 'transfer'
-    players.append(p)
-
-# Transfer - Unclaimed
-for fname in [
-    'backend/college/njcaa/njcaa_d1_players.json',
-    'backend/college/njcaa/njcaa_d2_players.json',
-    'backend/college/njcaa/njcaa_d3_players.json',
-]:
-    for p in load_json(fname):
-        p['claimed'] = False
-        p['type'] = 'transfer'
-        players.append(p)
-
-# High School - Claimed (future)
-# for p in load_json('backend/college/highschool/clean_claimed_highschool_players.json'):
-#     p['claimed'] = True
-#     p['type'] = 'highschool'
-#     players.append(p)
-
-# High School - Unclaimed
-for p in load_json('backend/college/highschool/highschool_players.json'):
-    p['claimed'] = False
-    p['type'] = 'highschool'
-    players.append(p)
-
-def fetch_player_data():
-    """Fetch player data from local college files and database claimed profiles"""
-    global _player_cache
-    # Force cache clear for debugging
-    _player_cache = {}
-    if _player_cache and len(_player_cache) > 0:
-        return _player_cache
-
-    players = []
-
-    # Transfer - Claimed from JSON (legacy)
-    for p in load_json('backend/college/njcaa/clean_claimed_players.json'):
-        p['claimed'] = True
-        p['type'] = 'transfer'
-        p['source'] = 'json'
-        players.append(p)
+    Claimed profiles from the database are not merged in here; they are
+    layered over this list by player_catalog.set_overlay(), hiding the
+    unclaimed record they replace.
+    """
+    claimed_json_players, unclaimed_players, highschool_players = load_static_players()
     
-    # Transfer - Unclaimed (we'll replace these with claimed versions if they exist)
-    unclaimed_players = []
-    for fname in [
-        'backend/college/njcaa/njcaa_d1_players.json',
-        'backend/college/njcaa/njcaa_d2_players.json',
-        'backend/college/njcaa/njcaa_d3_players.json',
-    ]:
-        for p in load_json(fname):
-            p['claimed'] = False
-            p['type'] = 'transfer'
-            p['source'] = 'json'
-            unclaimed_players.append(p)
-    
-    # Transfer - Claimed from database (new claims)
-    db_claimed_profiles = fetch_claimed_profiles_from_db()
-    
-    # Create a set of claimed player IDs for quick lookup
-    claimed_player_ids = set()
-    for p in db_claimed_profiles:
-        # Use the playerId from the converted profile (which was set from original_player_id)
-        player_id = p.get('playerId')
-        claimed_player_ids.add(player_id)
-        p['source'] = 'database'
-        players.append(p)
-    
-    print(f"DEBUG: Claimed player IDs from database: {claimed_player_ids}")
-    
-    # Add unclaimed players that don't have a claimed version
-    for p in unclaimed_players:
-        player_id = p.get('playerId') or p.get('id')
-        if player_id not in claimed_player_ids:
-            players.append(p)
-        else:
-            print(f"DEBUG: Skipping unclaimed player {player_id} because it has a claimed version")
-    
-    # High School - Unclaimed
-    highschool_players = load_json('backend/college/highschool/highschool_players.json')
-    print(f"DEBUG: Loaded {len(highschool_players)} high school players from JSON")
-    for p in highschool_players:
-        p['claimed'] = False
-        p['type'] = 'highschool'
-        p['source'] = 'json'
-        players.append(p)
-    print(f"DEBUG: Added {len(highschool_players)} high school players to total players")
-
+    # Transfer - Claimed from JSON (legacy), Transfer - Unclaimed, High School - Unclaimed
+    players = claimed_json_players + unclaimed_players + highschool_players
     print('DEBUG: Total college players loaded:', len(players))
-    print('DEBUG: Claimed players loaded:', sum(1 for p in players if p.get('claimed')))
-    print('DEBUG: Unclaimed players loaded:', sum(1 for p in players if not p.get('claimed')))
-    print('DEBUG: Database claimed profiles:', len(db_claimed_profiles))
-    _player_cache = players
     return players
 
-@app.route('/api/players', methods=['GET'])
-def get_players():
-    """Get filtered players"""
+# Base built once per worker; claims are an overlay swapped in without a rebuild
+player_catalog = PlayerCatalog(build_player_list)
+
+def on_claimed_profiles_change():
+    """Layer the refreshed claimed profiles over the catalog base"""
+    profiles = claimed_profiles.value()
+    version = player_catalog.set_overlay(profiles)
+    print(f"CATALOG: Snapshot v{version} with {len(profiles)} claimed profiles from database")
+
+# Claimed profiles are fetched off the request path: requests read the last
+# good result, even while Supabase is slow or down
+CLAIMED_PROFILES_REFRESH_SECONDS = float(os.getenv('CLAIMED_PROFILES_REFRESH_SECONDS', '60'))
+claimed_profiles = BackgroundRefresher(
+    fetch_claimed_profiles_from_db, CLAIMED_PROFILES_REFRESH_SECONDS,
+    on_change=on_claimed_profiles_change, initial=[], name='claimed-profiles'
+)
+
+# Claims patched in by the other gunicorn workers (see catalog_broadcast.py)
+catalog_broadcast = CatalogBroadcast()
+
+@app.before_request
+def apply_catalog_broadcast():
+    """Patch in the claims other workers saved since this worker's last request"""
     try:
-        # Get query parameters
-        league_filter = request.args.get('league')
-        position_filter = request.args.get('position')
-        nationality_filter = request.args.get('nationality')
-        type_filter = request.args.get('type')
-        
-        # Fetch all players
-        players = fetch_player_data()
-        
-        # Debug: Check what we're actually returning
-        print(f"API called - returning {len(players)} players")
-        print(f"Type filter: {type_filter}")
-        print(f"Players by type: {len([p for p in players if p.get('type') == 'transfer'])} transfer, {len([p for p in players if p.get('type') == 'highschool'])} highschool")
-        
-        # Apply filters
-        filtered_players = players
-        
-        # Type filter for college players
-        if type_filter and type_filter in ['transfer', 'highschool']:
-            print(f"Filtering by type: '{type_filter}'")
-            filtered_players = [p for p in filtered_players if p.get('type') == type_filter]
-            print(f"Players after type filter: {len(filtered_players)}")
-        
-        # Robust league filter: handle unicode/encoding issues
-        if league_filter and league_filter != 'All':
-            print(f"Filtering by league: '{league_filter}'")
-            filtered_players = [p for p in filtered_players if p.get('league', '').strip().lower() == league_filter.strip().lower()]
-            print(f"Players after league filter: {len(filtered_players)}")
-        
-        if position_filter and position_filter != 'All Positions':
-            filtered_players = [p for p in filtered_players if p.get('position') == position_filter]
-        
-        if nationality_filter and nationality_filter != 'All':
-            filtered_players = [p for p in filtered_players if p.get('nationality') == nationality_filter]
-        
-        return jsonify({
-            'players': filtered_players,
-            'total': len(filtered_players),
-            'filters_applied': {
-                'type': type_filter,
-                'league': league_filter,
-                'position': position_filter,
-                'nationality': nationality_filter
-            }
-        })
-        
+        changes = catalog_broadcast.poll()
+        if changes is None:
+            return
+        profiles, missed = changes
+        if profiles:
+            version = player_catalog.patch(profiles)
+            print(f"CATALOG: Snapshot v{version} patched with {len(profiles)} claimed profiles from another worker")
+        # Reconcile with the table in the background, like the publishing
+        # worker does; on a miss (the journal was truncated past entries this
+        # worker hadn't read) that refresh is what brings the claims in
+        if profiles or missed:
+            clear_player_cache()
     except Exception as e:
-        print(f"Error in get_players: {e}")
-        return jsonify({'error': str(e)}), 500
+        print(f"ERROR: Failed to apply catalog broadcast: {e}")
+
+@app.before_request
+def start_claimed_profiles_refresher():
+    # Under gunicorn the post_fork hook already started it in each worker;
+    # this covers the Flask dev server and other hosts
+    claimed_profiles.start()
+
+# Read-only catalog endpoints (/api/players, search, facets, autocomplete,
+# team logos), shared with simple_api.py
+init_catalog_api(app, player_catalog, claimed_profiles)
+app.register_blueprint(catalog_api)
 
 @app.route('/api/youtube-highlights', methods=['GET', 'OPTIONS'])
 def get_youtube_highlights():
@@ -488,23 +354,6 @@ def get_youtube_highlights():
             'note': 'YouTube search failed. Please check API key and try again.'
         }), 500
 
-@app.route('/api/team-logos', methods=['GET'])
-def get_team_logos():
-    """Get team logos for college teams"""
-    try:
-        print("Fetching team logos from GitHub...")
-        response = requests.get(TEAM_LOGOS_URL, timeout=30)
-        if response.status_code == 200:
-            team_logos = response.json()
-            print(f"Loaded {len(team_logos)} team logos")
-            return jsonify(team_logos)
-        else:
-            print(f"Failed to fetch team logos: {response.status_code}")
-            return jsonify({}), 500
-    except Exception as e:
-        print(f"Error fetching team logos: {e}")
-        return jsonify({}), 500
-
 @app.route('/api/health', methods=['GET'])
 def health_check():
     """Health check endpoint"""
@@ -679,14 +528,16 @@ def save_confirmed_claim(data, user_id, email):
             'Prefer': 'return=minimal'
         }
         
-        # Insert into claimed_profiles
+        # Insert into claimed_profiles, getting the stored row back for the catalog
         profile_response = requests.post(
             f'{supabase_url}/rest/v1/claimed_profiles',
-            headers=headers,
+            headers=dict(headers, Prefer='return=representation'),
             json=profile_data
         )
         
         if profile_response.status_code == 201:
+            patch_claimed_profiles(profile_response.json())
+            
             # Create user_profiles entry for the player
             user_profile_data = {
                 'user_id': user_id,
@@ -806,6 +657,7 @@ def migrate_pending_claims():
             return jsonify({'success': True, 'message': 'No pending claims to migrate'})
 
         migrated_count = 0
+        migrated_rows = []
         
         for claim in pending_claims:
             # Prepare claimed profile data
@@ -833,14 +685,16 @@ def migrate_pending_claims():
                 'why_player_is_transferring': claim['why_player_is_transferring']
             }
 
-            # Insert into claimed_profiles
+            # Insert into claimed_profiles, getting the stored row back for the catalog
             profile_response = requests.post(
                 f'{supabase_url}/rest/v1/claimed_profiles',
-                headers=headers,
+                headers=dict(headers, Prefer='return=representation'),
                 json=profile_data
             )
             
             if profile_response.status_code == 201:
+                migrated_rows.extend(profile_response.json())
+                
                 # Create user_profiles entry for the player
                 user_profile_data = {
                     'user_id': user_id,
@@ -876,10 +730,9 @@ def migrate_pending_claims():
 
         print(f"Migrated {migrated_count} pending claims for user {user_id}")
         
-        # Clear the player cache to ensure fresh data is loaded
-        if migrated_count > 0:
-            clear_player_cache()
-            print("Cleared player cache after successful migration")
+        # Show the new claims in the catalog right away
+        if migrated_rows:
+            patch_claimed_profiles(migrated_rows)
         
         return jsonify({'success': True, 'message': f'Migrated {migrated_count} pending claims'})
 
@@ -903,7 +756,7 @@ def create_checkout_session():
 
     price_id = MEMBERSHIP_PRICES[membership]
     try:
-        session = stripe.checkout.Session.create(
+        session = get_stripe().checkout.Session.create(
             payment_method_types=['card'],
             line_items=[{
                 'price': price_id,
@@ -956,8 +809,8 @@ def update_claimed_profile():
         if response.status_code == 200:
             updated_profile = response.json()
             if updated_profile:
-                # Clear the player cache to ensure fresh data is loaded
-                clear_player_cache()
+                # Show the edit in the catalog right away
+                patch_claimed_profiles(updated_profile)
                 return jsonify(updated_profile[0])
             else:
                 return jsonify({'error': 'Profile not found'}), 404
@@ -1500,6 +1353,10 @@ def contact():
         
         print(f"Attempting to send email from {SENDER_EMAIL} to {to_email}")
         
+        import smtplib
+        from email.mime.multipart import MIMEMultipart
+        from email.mime.text import MIMEText
+        
         # Create email message
         msg = MIMEMultipart()
         msg['From'] = SENDER_EMAIL
@@ -0,0 +1,381 @@
+"""
+Read-only player catalog endpoints.
+
+/api/players, /api/players/<id>, /api/players/batch, /api/players/search,
+/api/players/facets, /api/autocomplete and /api/team-logos only read the
+current catalog snapshot, so they live in a blueprint shared by the full API
+(api.py, which also merges database claims into its catalog) and the
+read-only catalog service (simple_api.py). The app registering the blueprint
+provides the PlayerCatalog with init_catalog_api().
+"""
+import os
+
+from flask import Blueprint, current_app, jsonify, request
+
+from player_catalog import (
+    DEFAULT_SORT, STAT_FIELDS, CachedResponse, decode_cursor, encode_cursor,
+    encode_json, encode_players_payload, parse_projection, parse_sort,
+    parse_stat_range, load_team_logos, team_logo,
+)
+from player_search import AUTOCOMPLETE_KINDS, MAX_COMPLETIONS, normalize_text
+
+catalog_api = Blueprint('catalog_api', __name__)
+
+def init_catalog_api(app, catalog, refresher=None):
+    """
+    Serve the catalog endpoints of `app` from `catalog` (a PlayerCatalog).
+
+    `refresher` is the BackgroundRefresher that layers database claims over
+    the catalog, if there is one: responses aren't cacheable until its first
+    refresh succeeded, and gunicorn.conf.py starts it in each worker.
+    """
+    app.extensions['player_catalog'] = catalog
+    app.extensions['catalog_refresher'] = refresher
+
+def current_catalog():
+    return current_app.extensions['player_catalog']
+
+# Lets the Vercel edge and browsers reuse player lists for a minute, then
+# serve stale copies while revalidating with If-None-Match
+PLAYERS_CACHE_CONTROL = os.getenv('PLAYERS_CACHE_CONTROL', 'public, max-age=60, stale-while-revalidate=600')
+
+def catalog_response(cached, compress=True):
+    """
+    Send a CachedResponse in the best encoding the client accepts, answering
+    If-None-Match with a 304.
+
+    Small bodies built for a single request (not kept in the response cache)
+    are sent with compress=False: compressing them would spend per request
+    the CPU the response cache exists to save. Larger ones are built as
+    CachedResponse(body, fast=True) and compressed with cheap settings.
+    """
+    if compress:
+        encoding, body, etag = cached.negotiate(request.accept_encodings)
+    else:
+        encoding, body, etag = None, cached.body, cached.etag
+    response = current_app.response_class(body, mimetype='application/json')
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    response.vary.add('Accept-Encoding')
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = catalog_cache_control()
+    return response.make_conditional(request)
+
+def catalog_cache_control():
+    """
+    PLAYERS_CACHE_CONTROL, or no-store while the claims haven't been loaded
+    yet: claimed players would be shown as unclaimed and cached downstream
+    """
+    refresher = current_app.extensions.get('catalog_refresher')
+    if refresher is not None and not refresher.ready:
+        return 'no-store'
+    return PLAYERS_CACHE_CONTROL
+
+def player_filters_from_request():
+    """Read the filters that actually narrow the result; raises ValueError on bad stat bounds"""
+    type_filter = request.args.get('type')
+    league_filter = request.args.get('league')
+    position_filter = request.args.get('position')
+    nationality_filter = request.args.get('nationality')
+    state_filter = request.args.get('state')
+    grad_year_filter = request.args.get('grad_year')
+    
+    filters = {}
+    if type_filter and type_filter in ['transfer', 'highschool']:
+        filters['type'] = type_filter
+    if league_filter and league_filter != 'All':
+        filters['league'] = league_filter
+    if position_filter and position_filter != 'All Positions':
+        filters['position'] = position_filter
+    if nationality_filter and nationality_filter != 'All':
+        filters['nationality'] = nationality_filter
+    if state_filter and state_filter != 'All':
+        filters['state'] = state_filter
+    if grad_year_filter and grad_year_filter != 'All':
+        filters['grad_year'] = grad_year_filter
+    
+    # Stat ranges: ?min_goals=5&max_minutes=900
+    for stat in STAT_FIELDS:
+        stat_range = parse_stat_range(request.args.get(f'min_{stat}'), request.args.get(f'max_{stat}'))
+        if stat_range:
+            filters[stat] = stat_range
+    return filters
+
+# Players returned per page at most; larger limits are clamped (before they
+# become part of the response cache key)
+MAX_PAGE_LIMIT = 1000
+
+def parse_limit(limit, maximum):
+    """Turn a ?limit= string into an int clamped to `maximum`; raises ValueError unless it is a positive integer"""
+    # isdecimal(), unlike isdigit(), rejects what int() can't parse (e.g. '²')
+    if not limit.isdecimal() or int(limit) < 1:
+        raise ValueError('limit must be a positive integer')
+    return min(int(limit), maximum)
+
+@catalog_api.route('/api/players', methods=['GET'])
+def get_players():
+    """Get filtered players"""
+    try:
+        # Get query parameters
+        league_filter = request.args.get('league')
+        position_filter = request.args.get('position')
+        nationality_filter = request.args.get('nationality')
+        type_filter = request.args.get('type')
+        filters = player_filters_from_request()
+        
+        # Pagination: ?limit=N&cursor=<next_cursor>&sort=[-]field
+        sort = request.args.get('sort')
+        cursor = request.args.get('cursor')
+        limit = request.args.get('limit')
+        after = None
+        if limit is not None:
+            limit = parse_limit(limit, MAX_PAGE_LIMIT)
+        if cursor:
+            cursor_sort, after = decode_cursor(cursor)
+            if sort and sort != cursor_sort:
+                return jsonify({'error': 'cursor was issued for a different sort'}), 400
+            sort = cursor_sort
+        if not sort and limit is not None:
+            # Pages need a deterministic order that survives catalog reloads
+            sort = DEFAULT_SORT
+        if sort:
+            parse_sort(sort)
+        
+        # Sparse fieldsets: ?fields=name,team,... or ?view=card|detail
+        projection = parse_projection(request.args.get('view'), request.args.get('fields'))
+        
+        snapshot = current_catalog().snapshot()
+        
+        def select_page():
+            # Filters are answered from the snapshot's precomputed indexes
+            rows = snapshot.select(filters)
+            page_rows = rows
+            next_cursor = None
+            if sort:
+                page_rows, next_key = snapshot.page(rows, sort, limit=limit, after=after)
+                if next_key is not None:
+                    next_cursor = encode_cursor(sort, next_key)
+            return rows, page_rows, next_cursor
+        
+        filters_applied = {
+            'type': type_filter,
+            'league': league_filter,
+            'position': position_filter,
+            'nationality': nationality_filter,
+            'state': filters.get('state'),
+            'grad_year': filters.get('grad_year'),
+            'sort': sort
+        }
+        
+        # Streaming modes write records as they are read instead of buffering
+        # the whole body: NDJSON for Accept: application/x-ndjson, or the
+        # regular JSON document sent in chunks with ?stream=1
+        wants_ndjson = request.accept_mimetypes.best_match(['application/json', 'application/x-ndjson']) == 'application/x-ndjson'
+        if wants_ndjson or request.args.get('stream') in ('1', 'true'):
+            rows, page_rows, next_cursor = select_page()
+            if wants_ndjson:
+                response = current_app.response_class(snapshot.stream_ndjson(page_rows, projection), mimetype='application/x-ndjson')
+                response.headers['X-Total-Count'] = str(len(rows))
+                if next_cursor:
+                    response.headers['X-Next-Cursor'] = next_cursor
+            else:
+                response = current_app.response_class(snapshot.stream_players(
+                    page_rows, projection,
+                    total=len(rows),
+                    next_cursor=next_cursor,
+                    filters_applied=filters_applied
+                ), mimetype='application/json')
+            response.headers['Cache-Control'] = catalog_cache_control()
+            return response
+        
+        def build_body():
+            rows, page_rows, next_cursor = select_page()
+            return snapshot.encode_players(
+                page_rows, projection,
+                total=len(rows),
+                next_cursor=next_cursor,
+                filters_applied=filters_applied
+            )
+        
+        # Encoded bodies are cached per catalog version under the normalized query
+        cache_key = (
+            'players', type_filter, league_filter, position_filter, nationality_filter,
+            tuple(sorted(filters.items())), sort, limit, after, projection
+        )
+        return catalog_response(snapshot.responses.get(cache_key, build_body, filters))
+        
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        print(f"Error in get_players: {e}")
+        return jsonify({'error': str(e)}), 500
+
+@catalog_api.route('/api/players/<player_id>', methods=['GET'])
+def get_player(player_id):
+    """One player by playerId (or the derived key of players without one), with their team logo"""
+    # GET /api/players/batch lands here rather than on the POST-only route
+    if player_id == 'batch':
+        return jsonify({'error': 'Method not allowed, POST a JSON body like {"ids": [...]}'}), 405, {'Allow': 'POST'}
+    try:
+        projection = parse_projection(request.args.get('view'), request.args.get('fields'))
+        snapshot = current_catalog().snapshot()
+        row = snapshot.find(player_id)
+        if row is None:
+            return jsonify({'error': 'Player not found'}), 404
+        
+        # A hash lookup and the player's pre-encoded fragment: too cheap to be
+        # worth an entry in the response cache
+        fragment, = snapshot.lookup_fragments([row], projection)
+        body = b''.join([
+            b'{"player":', fragment,
+            b',"team_logo":', encode_json(team_logo(snapshot.record(row))), b'}'
+        ])
+        return catalog_response(CachedResponse(body), compress=False)
+        
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        print(f"Error in get_player: {e}")
+        return jsonify({'error': str(e)}), 500
+
+# Ids accepted by one /api/players/batch request
+MAX_BATCH_IDS = 500
+
+@catalog_api.route('/api/players/batch', methods=['POST'])
+def get_players_batch():
+    """Players for a list of ids (e.g. a saved-player list), in request order, plus the unknown ids"""
+    try:
+        data = request.get_json(silent=True)
+        if not isinstance(data, dict):
+            return jsonify({'error': 'Body must be a JSON object like {"ids": [...]}'}), 400
+        ids = data.get('ids')
+        if not isinstance(ids, list) or not all(
+            isinstance(player_id, (str, int)) and not isinstance(player_id, bool) for player_id in ids
+        ):
+            return jsonify({'error': 'ids must be a list of player ids'}), 400
+        if len(ids) > MAX_BATCH_IDS:
+            return jsonify({'error': f'At most {MAX_BATCH_IDS} ids per request'}), 400
+        
+        projection = parse_projection(request.args.get('view'), request.args.get('fields'))
+        snapshot = current_catalog().snapshot()
+        
+        # Id index lookups, then a join of the pre-encoded fragments
+        rows = []
+        missing = []
+        for player_id in dict.fromkeys(str(player_id) for player_id in ids):
+            row = snapshot.find(player_id)
+            if row is None:
+                missing.append(player_id)
+            else:
+                rows.append(row)
+        
+        # Up to MAX_BATCH_IDS full records: worth compressing even per request
+        body = encode_players_payload(snapshot.lookup_fragments(rows, projection), missing=missing, total=len(rows))
+        return catalog_response(CachedResponse(body, fast=True))
+        
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        print(f"Error in get_players_batch: {e}")
+        return jsonify({'error': str(e)}), 500
+
+# Search results returned by default / at most
+SEARCH_DEFAULT_LIMIT = 20
+SEARCH_MAX_LIMIT = 100
+
+@catalog_api.route('/api/players/search', methods=['GET'])
+def search_players():
+    """Typo-tolerant search by player name, team/club and hometown"""
+    try:
+        query = (request.args.get('q') or '').strip()
+        if len(query) < 2:
+            return jsonify({'error': 'q must be at least 2 characters'}), 400
+        
+        limit = parse_limit(request.args.get('limit', str(SEARCH_DEFAULT_LIMIT)), SEARCH_MAX_LIMIT)
+        
+        filters = player_filters_from_request()
+        projection = parse_projection(request.args.get('view'), request.args.get('fields'))
+        snapshot = current_catalog().snapshot()
+        
+        def build_body():
+            results = snapshot.search(query, limit=limit, filters=filters)
+            return snapshot.encode_players(
+                [row for row, _ in results], projection,
+                scores=[score for _, score in results],
+                total=len(results),
+                query=query
+            )
+        
+        cache_key = ('search', normalize_text(query), tuple(sorted(filters.items())), limit, projection)
+        return catalog_response(snapshot.responses.get(cache_key, build_body, filters))
+        
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        print(f"Error in search_players: {e}")
+        return jsonify({'error': str(e)}), 500
+
+@catalog_api.route('/api/players/facets', methods=['GET'])
+def get_player_facets():
+    """Per-value player counts for each filter, under the active filters"""
+    try:
+        filters = player_filters_from_request()
+        snapshot = current_catalog().snapshot()
+        
+        def build_body():
+            return encode_json({
+                'facets': snapshot.facets(filters),
+                'total': len(snapshot.select(filters)),
+                'filters_applied': filters
+            })
+        
+        # Each facet is counted without its own filter, so any claim change
+        # can move a count: the body depends on all players (the default)
+        cache_key = ('facets', tuple(sorted(filters.items())))
+        return catalog_response(snapshot.responses.get(cache_key, build_body))
+        
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        print(f"Error in get_player_facets: {e}")
+        return jsonify({'error': str(e)}), 500
+
+@catalog_api.route('/api/autocomplete', methods=['GET'])
+def autocomplete():
+    """As-you-type suggestions for player names, teams, clubs and leagues"""
+    try:
+        prefix = request.args.get('prefix') or ''
+        kind = request.args.get('kind', 'name')
+        if kind not in AUTOCOMPLETE_KINDS:
+            return jsonify({'error': f"Invalid kind '{kind}'. Must be one of: {', '.join(AUTOCOMPLETE_KINDS)}"}), 400
+        
+        limit = parse_limit(request.args.get('limit', '10'), MAX_COMPLETIONS)
+        
+        completions = current_catalog().snapshot().complete(kind, prefix, limit)
+        # Too small and too varied to be worth the response cache, but still
+        # gets an ETag and Cache-Control (and no per-request compression)
+        return catalog_response(CachedResponse(encode_json({
+            'suggestions': [{'value': value, 'count': count} for value, count in completions],
+            'kind': kind,
+            'prefix': prefix
+        })), compress=False)
+        
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        print(f"Error in autocomplete: {e}")
+        return jsonify({'error': str(e)}), 500
+
+@catalog_api.route('/api/team-logos', methods=['GET'])
+def get_team_logos():
+    """Get team logos for college teams"""
+    try:
+        # The file shipped with the repo, the same one player details use;
+        # encoded and compressed once, claims don't touch it
+        cached = current_catalog().snapshot().responses.get(
+            ('team-logos',), lambda: encode_json(load_team_logos()), None
+        )
+        return catalog_response(cached)
+    except Exception as e:
+        print(f"Error loading team logos: {e}")
+        return jsonify({}), 500
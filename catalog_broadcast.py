@@ -0,0 +1,165 @@
+"""
+Claim changes broadcast between the gunicorn workers of one host.
+
+Each worker holds its own PlayerCatalog, so a claim patched into the catalog
+by the worker that handled the request (see patch_claimed_profiles() in
+api.py) would only reach the others on their next claimed profiles refresh.
+Instead, the worker appends the patched profiles to a journal file and bumps
+a generation counter kept in a small mmap'ed file:
+
+    generation file   GENERATION: generation, journal epoch (two uint64)
+    journal           one JSON line per patch: generation, pid, profiles
+
+Every request compares the mapped generation with the last one its worker
+saw, which costs a memory read, and only reads the journal when it moved.
+The journal is truncated once it outgrows JOURNAL_MAX_BYTES; that bumps the
+epoch, and a worker that sees a new epoch reloads the claims from the
+database since it may have missed entries.
+
+Writers and readers take an flock on the generation file, so it needs a
+filesystem shared by the workers (the default is the temp directory).
+"""
+import json
+import mmap
+import os
+import struct
+import tempfile
+import threading
+
+# flock is POSIX only; without it (e.g. a Windows dev server, one process)
+# there is nothing to broadcast to
+try:
+    import fcntl
+    BROADCAST_AVAILABLE = True
+except ImportError:
+    BROADCAST_AVAILABLE = False
+
+CATALOG_GENERATION_FILE = os.getenv(
+    'CATALOG_GENERATION_FILE', os.path.join(tempfile.gettempdir(), 'draftai-catalog-generation')
+)
+
+GENERATION = struct.Struct('<QQ')
+
+# The journal is truncated before an append would take it past this size
+JOURNAL_MAX_BYTES = 1024 * 1024
+
+
+class CatalogBroadcast:
+    """
+    Generation counter plus patch journal shared by the workers of one host.
+
+    Files are opened per process on first use, so a gunicorn master that
+    preloads the app doesn't hand one flock'ed file description to all of its
+    workers. poll() is meant to run before each request, publish() after a
+    worker patched its own catalog.
+    """
+
+    def __init__(self, path=CATALOG_GENERATION_FILE):
+        self.path = path
+        self.journal_path = f'{path}.journal'
+        self._pid = None
+        self._file = None
+        self._mmap = None
+        self._generation = 0
+        self._epoch = 0
+        self._offset = 0
+        self._lock = threading.Lock()
+
+    def _open(self):
+        """Map the generation file in this process; starts from the current generation"""
+        if self._pid == os.getpid():
+            return self._mmap is not None
+        with self._lock:
+            if self._pid == os.getpid():
+                return self._mmap is not None
+            self._pid = os.getpid()
+            self._mmap = None
+            if not BROADCAST_AVAILABLE:
+                return False
+            try:
+                self._file = open(self.path, 'a+b')
+                fcntl.flock(self._file, fcntl.LOCK_EX)
+                try:
+                    if os.fstat(self._file.fileno()).st_size < GENERATION.size:
+                        self._file.truncate(GENERATION.size)
+                    self._mmap = mmap.mmap(self._file.fileno(), GENERATION.size)
+                    self._generation, self._epoch = GENERATION.unpack_from(self._mmap, 0)
+                    self._offset = self._journal_size()
+                finally:
+                    fcntl.flock(self._file, fcntl.LOCK_UN)
+            except OSError as e:
+                print(f"ERROR: Catalog broadcast disabled, cannot open {self.path}: {e}")
+                self._mmap = None
+            return self._mmap is not None
+
+    def _journal_size(self):
+        try:
+            return os.path.getsize(self.journal_path)
+        except FileNotFoundError:
+            return 0
+
+    def publish(self, profiles):
+        """Append claimed profiles this worker patched in, and bump the generation"""
+        if not self._open():
+            return None
+        with self._lock:
+            fcntl.flock(self._file, fcntl.LOCK_EX)
+            try:
+                generation, epoch = GENERATION.unpack_from(self._mmap, 0)
+                # Nothing unread before this entry: skip past it, so the next
+                # poll() doesn't find this worker's own write
+                up_to_date = (generation, epoch) == (self._generation, self._epoch)
+                generation += 1
+                line = json.dumps({'generation': generation, 'pid': self._pid, 'profiles': profiles}).encode('utf-8') + b'\n'
+                mode = 'ab'
+                if self._journal_size() + len(line) > JOURNAL_MAX_BYTES:
+                    mode = 'wb'
+                    epoch += 1
+                with open(self.journal_path, mode) as journal:
+                    journal.write(line)
+                    end = journal.tell()
+                GENERATION.pack_into(self._mmap, 0, generation, epoch)
+                if up_to_date:
+                    self._generation, self._epoch, self._offset = generation, epoch, end
+            finally:
+                fcntl.flock(self._file, fcntl.LOCK_UN)
+            return generation
+
+    def poll(self):
+        """
+        Changes published by the other workers since the last poll, as
+        (profiles, missed): the profiles to patch in, in publish order, and
+        whether entries were lost to a journal truncation (reload then).
+        Returns None when the generation hasn't moved.
+        """
+        if not self._open():
+            return None
+        generation, epoch = GENERATION.unpack_from(self._mmap, 0)
+        if generation == self._generation and epoch == self._epoch:
+            return None
+
+        with self._lock:
+            fcntl.flock(self._file, fcntl.LOCK_SH)
+            try:
+                generation, epoch = GENERATION.unpack_from(self._mmap, 0)
+                missed = epoch != self._epoch
+                offset = 0 if missed else self._offset
+                try:
+                    with open(self.journal_path, 'rb') as journal:
+                        journal.seek(offset)
+                        data = journal.read()
+                except FileNotFoundError:
+                    data = b''
+            finally:
+                fcntl.flock(self._file, fcntl.LOCK_UN)
+
+            seen = self._generation
+            self._generation, self._epoch = generation, epoch
+            self._offset = offset + len(data)
+
+        profiles = []
+        for line in data.splitlines():
+            entry = json.loads(line)
+            if entry['pid'] != self._pid and (missed or entry['generation'] > seen):
+                profiles.extend(entry['profiles'])
+        return profiles, missed
@@ -0,0 +1,132 @@
+"""
+Incremental sync of the Supabase claimed_profiles table.
+
+claimed_profiles keeps updated_at current with a trigger (see
+claimed_profiles_schema.sql), so after one full load only the rows changed
+since the newest updated_at seen need to be fetched. Rows are requested with
+an explicit column list and paged with Range headers, and applied to an
+in-memory overlay keyed by original_player_id.
+
+Deletes are invisible to a delta query, so the whole table is re-read every
+`full_sync_interval` seconds.
+"""
+import time
+
+import requests
+
+# Columns read from claimed_profiles, i.e. everything convert_claimed_profile() uses
+CLAIMED_PROFILE_COLUMNS = (
+    'id', 'original_player_id', 'claimed_by_user_id', 'name', 'position', 'current_school',
+    'division_transferring_from', 'email_address', 'years_of_eligibility_left', 'gpa',
+    'individual_awards', 'college_accolades', 'highlights', 'full_game_link', 'height',
+    'weight', 'credit_hours_taken', 'available', 'nationality', 'year_of_birth', 'finances',
+    'why_player_is_transferring', 'claimed_at', 'updated_at',
+)
+
+# Rows requested per Range page
+PAGE_SIZE = 500
+
+
+def convert_claimed_profile(profile):
+    """Convert a claimed_profiles row to the player JSON format"""
+    return {
+        'playerId': profile['original_player_id'],
+        'claimed': True,
+        'type': 'transfer',
+        'Name': profile['name'],
+        'Position': profile['position'],
+        'Current School': profile['current_school'],
+        'Division Transferring From': profile['division_transferring_from'],
+        'Email Address': profile['email_address'],
+        'Years of Eligibility Left': profile['years_of_eligibility_left'],
+        'GPA': str(profile['gpa']) if profile['gpa'] else '',
+        'Individual Awards': profile['individual_awards'] or '',
+        'College Accolades': profile['college_accolades'] or '',
+        'Highlights': profile['highlights'] or '',
+        'Full 90 min Game Link': profile['full_game_link'] or '',
+        'Height': profile['height'] or '',
+        'Weight (lbs)': profile['weight'] or '',
+        'Credit Hours Taken when you will transfer': profile['credit_hours_taken'] or '',
+        'Available': profile['available'] or '',
+        'Nationality': profile['nationality'] or '',
+        'Year of Birth': profile['year_of_birth'] or '',
+        'Finances': profile['finances'] or '',
+        'Why Player is Transferring': profile['why_player_is_transferring'] or '',
+        'photo_url': '',  # No photo URL in database for now
+        'claimed_at': profile['claimed_at'],
+        'claimed_by_user_id': profile['claimed_by_user_id'],
+        'source': 'database'
+    }
+
+
+class ClaimedProfilesSync:
+    """
+    Overlay of converted claimed profiles, kept current with delta queries.
+
+    sync() is meant to be called from a single thread (the claimed profiles
+    BackgroundRefresher); it raises on any HTTP failure or malformed row,
+    leaving the overlay and the high-water mark as they were.
+    """
+
+    def __init__(self, supabase_url, supabase_key, timeout, full_sync_interval=3600):
+        self.url = f'{supabase_url}/rest/v1/claimed_profiles'
+        self.headers = {
+            'apikey': supabase_key,
+            'Authorization': f'Bearer {supabase_key}',
+        }
+        self.timeout = timeout
+        self.full_sync_interval = full_sync_interval
+        self.profiles = {}
+        self.high_water = None
+        self.last_full_sync = None
+
+    def fetch_rows(self, since=None):
+        """All rows with updated_at >= `since` (every row if None), oldest change first"""
+        params = {
+            'select': ','.join(CLAIMED_PROFILE_COLUMNS),
+            'order': 'updated_at.asc,id.asc',
+        }
+        if since is not None:
+            # gte rather than gt: rows committed later with the same timestamp
+            # are not skipped, and re-applying a row is harmless
+            params['updated_at'] = f'gte.{since}'
+
+        rows = []
+        while True:
+            headers = dict(self.headers, **{
+                'Range-Unit': 'items',
+                'Range': f'{len(rows)}-{len(rows) + PAGE_SIZE - 1}',
+            })
+            response = requests.get(self.url, params=params, headers=headers, timeout=self.timeout)
+            response.raise_for_status()
+            page = response.json() or []
+            rows.extend(page)
+            if len(page) < PAGE_SIZE:
+                return rows
+
+    def sync(self):
+        """Bring the overlay up to date; returns the converted profiles as a list"""
+        now = time.monotonic()
+        full = self.last_full_sync is None or now - self.last_full_sync >= self.full_sync_interval
+        rows = self.fetch_rows(None if full else self.high_water)
+
+        # Applied to a copy, swapped in once every row converted
+        profiles = {} if full else dict(self.profiles)
+        high_water = None if full else self.high_water
+        changed = 0
+        for row in rows:
+            profile = convert_claimed_profile(row)
+            if profiles.get(profile['playerId']) != profile:
+                profiles[profile['playerId']] = profile
+                changed += 1
+            if row.get('updated_at') and (high_water is None or row['updated_at'] > high_water):
+                high_water = row['updated_at']
+
+        self.profiles = profiles
+        self.high_water = high_water
+        if full:
+            self.last_full_sync = now
+            print(f"DEBUG: Full sync loaded {len(profiles)} claimed profiles from database")
+        elif changed:
+            print(f"DEBUG: Delta sync applied {changed} claimed profile changes from database")
+        return list(profiles.values())
@@ -0,0 +1,291 @@
+"""
+Compiled binary snapshot of the static player files.
+
+Parsing the indented JSON files (and re-encoding every record for the API)
+dominates worker start-up. `python compiled_catalog.py` compiles them once,
+at build time, into a single file that the API opens with mmap:
+
+    header    MAGIC, FORMAT_VERSION, length of the metadata
+    metadata  JSON: source file signatures, key schemas, group sizes,
+              pre-encoded views and the section table
+    sections  8-byte aligned arrays, read in place with np.frombuffer
+        value_offsets / value_kinds / value_pool
+                  every distinct field value once (the string pool)
+        records   fixed-width int32 table: schema id, then one value id per key
+        fragments.N / fragment_offsets.N
+                  the pre-encoded JSON of each record for view N
+        index.*   filter columns and sort orders of the catalog base, see
+                  CatalogBase.index_sections()
+
+The file records the size and mtime of the JSON files it was compiled from;
+load_static_players() falls back to the JSON files when it is missing, built
+by another format version, or when any source's size or mtime differs from
+the recorded one.
+"""
+import json
+import mmap
+import os
+import struct
+import sys
+
+import numpy as np
+
+from player_records import PlayerRecord, record_schema
+
+MAGIC = b'DRAFTCAT'
+# 2: legacy claimed and high school records carry their derived playerId
+# 3: filter columns and sort orders (bump when sort_key() or a normalizer changes)
+FORMAT_VERSION = 3
+HEADER = struct.Struct('<8sII')
+ALIGNMENT = 8
+
+# Player groups, in the order load_static_players() returns them
+GROUPS = ('claimed', 'unclaimed', 'highschool')
+
+# Value ids below zero are constants; value_kinds tells strings from other JSON
+NONE_VALUE, FALSE_VALUE, TRUE_VALUE = -1, -2, -3
+CONSTANT_VALUES = {NONE_VALUE: None, FALSE_VALUE: False, TRUE_VALUE: True}
+KIND_STRING, KIND_JSON = 0, 1
+
+
+def source_signature(paths):
+    """{path: [size, mtime_ns]} for the source files"""
+    signature = {}
+    for path in paths:
+        stat = os.stat(path)
+        signature[path] = [stat.st_size, stat.st_mtime_ns]
+    return signature
+
+
+class CompiledPlayerRecord(PlayerRecord):
+    """PlayerRecord whose pre-encoded JSON fragments live in a CompiledCatalog"""
+    __slots__ = ('_catalog', '_row')
+
+    def __init__(self, schema, values, catalog, row):
+        super().__init__(schema, values)
+        self._catalog = catalog
+        self._row = row
+
+    def fragment(self, fields):
+        return self._catalog.fragment(fields, self._row)
+
+
+class CompiledCatalog:
+    """A compiled snapshot file, mapped read-only"""
+
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, meta_length = HEADER.unpack_from(self._mmap, 0)
+        if magic != MAGIC:
+            raise ValueError(f'{path} is not a compiled catalog')
+        self.format_version = version
+        self.meta = json.loads(self._mmap[HEADER.size:HEADER.size + meta_length])
+        self._data_start = aligned(HEADER.size + meta_length)
+        self._view = memoryview(self._mmap)
+        self._fragments = {}
+
+    def is_current(self, sources):
+        """True if compiled by this code from the current versions of `sources`"""
+        return self.format_version == FORMAT_VERSION and self.meta['sources'] == source_signature(sources)
+
+    def section(self, name):
+        offset, length = self.meta['sections'][name]
+        start = self._data_start + offset
+        return self._view[start:start + length]
+
+    def array(self, name, dtype):
+        return np.frombuffer(self.section(name), dtype=dtype)
+
+    def players(self):
+        """Decode the records into (claimed, unclaimed, highschool) lists"""
+        offsets = self.array('value_offsets', np.int64).tolist()
+        kinds = self.array('value_kinds', np.int8).tolist()
+        pool = bytes(self.section('value_pool'))
+        schemas = [record_schema(tuple(keys)) for keys in self.meta['schemas']]
+
+        values = []
+        for i, kind in enumerate(kinds):
+            text = pool[offsets[i]:offsets[i + 1]].decode('utf-8')
+            values.append(text if kind == KIND_STRING else json.loads(text))
+        # Constants go at the end so that negative value ids index them directly
+        lookup = values + [CONSTANT_VALUES[code] for code in sorted(CONSTANT_VALUES)]
+
+        table = self.array('records', np.int32).reshape(-1, self.meta['width'] + 1)
+        records = []
+        value_at = lookup.__getitem__
+        for row, cells in enumerate(table.tolist()):
+            schema = schemas[cells[0]]
+            record_values = tuple(map(value_at, cells[1:len(schema.keys) + 1]))
+            records.append(CompiledPlayerRecord(schema, record_values, self, row))
+
+        groups = []
+        start = 0
+        for name in GROUPS:
+            size = self.meta['groups'][name]
+            groups.append(records[start:start + size])
+            start += size
+
+        self._fragments = {}
+        for i, fields in enumerate(self.meta['views']):
+            fields = tuple(fields) if fields is not None else None
+            self._fragments[fields] = (self.section(f'fragments.{i}'), self.array(f'fragment_offsets.{i}', np.int64))
+        return tuple(groups)
+
+    def fragment(self, fields, row):
+        """Pre-encoded JSON of record `row` for a projection, None if not compiled in"""
+        compiled = self._fragments.get(fields)
+        if compiled is None:
+            return None
+        data, offsets = compiled
+        return data[offsets[row]:offsets[row + 1]]
+
+    def fragment_sections(self, fields):
+        """
+        (data, offsets) of every record's JSON for a projection, both read in
+        place from the mapping; None if the projection wasn't compiled in
+        """
+        return self._fragments.get(fields)
+
+    def indexes(self):
+        """
+        The `indexes` given to write_compiled_catalog() as (arrays, meta),
+        arrays read in place from the mapping; None if it had none
+        """
+        indexes = self.meta.get('indexes')
+        if indexes is None:
+            return None
+        arrays = {name: self.array(f'index.{name}', np.dtype(dtype)) for name, dtype in indexes['arrays'].items()}
+        return arrays, indexes['meta']
+
+
+def compiled_catalog_of(players):
+    """
+    The CompiledCatalog whose records `players` are, all of them in file
+    order, or None; its fragment sections then line up with `players`.
+    """
+    if not players or not isinstance(players[0], CompiledPlayerRecord):
+        return None
+    catalog = players[0]._catalog
+    for row, p in enumerate(players):
+        if not isinstance(p, CompiledPlayerRecord) or p._catalog is not catalog or p._row != row:
+            return None
+    if len(players) != sum(catalog.meta['groups'].values()):
+        return None
+    return catalog
+
+
+def aligned(offset):
+    return (offset + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+
+def write_compiled_catalog(path, groups, views, encode, sources, indexes=None):
+    """
+    Write `groups` (lists of PlayerRecords, in GROUPS order) to `path`.
+
+    `views` lists the projections to pre-encode (None for full records) and
+    `encode(record, fields)` returns a record's JSON bytes for one of them.
+    `indexes` is an optional (arrays, meta) pair: {name: NumPy array} written
+    as sections, plus JSON metadata, handed back by CompiledCatalog.indexes().
+    """
+    records = [p for group in groups for p in group]
+
+    value_ids = {}
+    pool = []
+    offsets = [0]
+    kinds = []
+
+    def value_id(value):
+        if value is None:
+            return NONE_VALUE
+        if value is True:
+            return TRUE_VALUE
+        if value is False:
+            return FALSE_VALUE
+        # Lists and dicts are unhashable, they are keyed by their JSON text
+        key = (type(value), json.dumps(value) if isinstance(value, (list, dict)) else value)
+        vid = value_ids.get(key)
+        if vid is None:
+            if isinstance(value, str):
+                kinds.append(KIND_STRING)
+                encoded = value.encode('utf-8')
+            else:
+                kinds.append(KIND_JSON)
+                encoded = json.dumps(value).encode('utf-8')
+            vid = value_ids[key] = len(pool)
+            pool.append(encoded)
+            offsets.append(offsets[-1] + len(encoded))
+        return vid
+
+    schema_ids = {}
+    width = max((len(p) for p in records), default=0)
+    table = np.full((len(records), width + 1), NONE_VALUE, dtype=np.int32)
+    for row, p in enumerate(records):
+        keys = tuple(p)
+        table[row, 0] = schema_ids.setdefault(keys, len(schema_ids))
+        table[row, 1:len(keys) + 1] = [value_id(value) for _, value in p.items()]
+
+    sections = [
+        ('value_offsets', np.array(offsets, dtype=np.int64).tobytes()),
+        ('value_kinds', np.array(kinds, dtype=np.int8).tobytes()),
+        ('value_pool', b''.join(pool)),
+        ('records', table.tobytes()),
+    ]
+    for i, fields in enumerate(views):
+        fragments = [encode(p, fields) for p in records]
+        fragment_offsets = np.zeros(len(fragments) + 1, dtype=np.int64)
+        np.cumsum([len(fragment) for fragment in fragments], out=fragment_offsets[1:])
+        sections.append((f'fragments.{i}', b''.join(fragments)))
+        sections.append((f'fragment_offsets.{i}', fragment_offsets.tobytes()))
+    index_meta = None
+    if indexes is not None:
+        arrays, meta = indexes
+        index_meta = {'arrays': {name: array.dtype.str for name, array in arrays.items()}, 'meta': meta}
+        sections.extend((f'index.{name}', np.ascontiguousarray(array).tobytes()) for name, array in arrays.items())
+
+    section_table = {}
+    offset = 0
+    for name, data in sections:
+        section_table[name] = [offset, len(data)]
+        offset = aligned(offset + len(data))
+
+    meta = json.dumps({
+        'sources': source_signature(sources),
+        'schemas': [list(keys) for keys in schema_ids],
+        'groups': {name: len(group) for name, group in zip(GROUPS, groups)},
+        'width': width,
+        'views': [list(fields) if fields is not None else None for fields in views],
+        'indexes': index_meta,
+        'sections': section_table,
+    }).encode('utf-8')
+
+    # Written next to the target and renamed, so running workers never map a half-written file
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, FORMAT_VERSION, len(meta)))
+        f.write(meta)
+        f.write(b'\0' * (aligned(HEADER.size + len(meta)) - HEADER.size - len(meta)))
+        for name, data in sections:
+            f.write(data)
+            f.write(b'\0' * (aligned(len(data)) - len(data)))
+    os.replace(tmp_path, path)
+    return len(records)
+
+
+def main(argv):
+    from player_catalog import (COMPILED_CATALOG_FILE, PREENCODED_VIEWS, STATIC_PLAYER_FILES, VIEWS,
+                                CatalogBase, encode_record, read_static_players)
+
+    path = argv[1] if len(argv) > 1 else COMPILED_CATALOG_FILE
+    groups = read_static_players()
+    # The base the API builds over these records, for its filter columns and sort orders
+    base = CatalogBase(0, [p for group in groups for p in group])
+    count = write_compiled_catalog(
+        path, groups, [VIEWS[view] for view in PREENCODED_VIEWS], encode_record, STATIC_PLAYER_FILES,
+        base.index_sections()
+    )
+    print(f"CATALOG: Compiled {count} players into {path} ({os.path.getsize(path)} bytes)")
+
+
+if __name__ == '__main__':
+    main(sys.argv)
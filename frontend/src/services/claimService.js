@@ -151,17 +151,19 @@ export const updateClaimedProfile = async (profileId, updates) => {
  */
 export const isProfileAlreadyClaimed = async (originalPlayerId) => {
   try {
-    // For now, we'll check against the players API to see if the player is marked as claimed
-    const response = await fetch(`${apiBaseUrl}/api/players?type=transfer`);
-    
+    // Look the player up by id instead of downloading every transfer
+    const response = await fetch(`${apiBaseUrl}/api/players/${encodeURIComponent(originalPlayerId)}?view=card`);
+
+    if (response.status === 404) {
+      return false;
+    }
     if (!response.ok) {
-      throw new Error('Failed to fetch players');
+      throw new Error('Failed to fetch player');
     }
 
     const data = await response.json();
-    const player = data.players.find(p => (p.playerId || p.id) === originalPlayerId);
-    
-    return player ? player.claimed : false;
+
+    return data.player.claimed || false;
   } catch (error) {
     console.error('Error in isProfileAlreadyClaimed:', error);
     throw error;
@@ -0,0 +1,51 @@
+"""
+Gunicorn settings for the API (see Procfile).
+
+By default the app is preloaded: it is imported once in the master, the
+player catalog snapshot and its indexes are built there, and workers are
+forked from it so they share the catalog copy-on-write instead of each
+parsing the JSON files and building their own indexes.
+gc.freeze() moves everything built so far out of the collector's reach, so
+collections in the workers don't write to (and un-share) those pages.
+
+Set PRELOAD_CATALOG=false to go back to each worker loading the app itself.
+Worker count comes from WEB_CONCURRENCY and the port from PORT, as usual.
+
+Each worker starts its claimed profiles refresher right after the fork and
+waits up to CLAIMS_READY_TIMEOUT seconds for the first refresh, so it doesn't
+serve claimed players as unclaimed (until then responses are sent no-store).
+"""
+import gc
+import os
+
+preload_app = os.getenv('PRELOAD_CATALOG', 'true').lower() not in ('0', 'false', 'no')
+
+# Kept well under gunicorn's worker timeout, which already runs during post_fork
+CLAIMS_READY_TIMEOUT = float(os.getenv('CLAIMS_READY_TIMEOUT', '10'))
+
+
+def when_ready(server):
+    """Build the catalog in the master, after the app is loaded and before workers fork"""
+    if not preload_app:
+        return
+    # api:app or simple_api:app, both register their catalog via init_catalog_api()
+    catalog = server.app.wsgi().extensions.get('player_catalog')
+    if catalog is None:
+        return
+    snapshot = catalog.snapshot()
+    # Indexes built lazily would otherwise be built again in every worker
+    snapshot.base.warm()
+    gc.collect()
+    gc.freeze()
+    server.log.info("Preloaded player catalog v%s with %s players", snapshot.version, len(snapshot))
+
+
+def post_fork(server, worker):
+    """Start the worker's claimed profiles refresher and wait (bounded) for its first result"""
+    # Only api:app registers one, see init_catalog_api()
+    refresher = worker.app.wsgi().extensions.get('catalog_refresher')
+    if refresher is None:
+        return
+    refresher.start()
+    if not refresher.wait_ready(CLAIMS_READY_TIMEOUT):
+        server.log.warning("Claimed profiles not loaded after %ss, serving without them", CLAIMS_READY_TIMEOUT)
@@ -0,0 +1,1261 @@
+"""
+In-memory player catalog shared by the player endpoints.
+
+The catalog holds an immutable, versioned snapshot of every player served by
+/api/players: a base built once per process from the static player files,
+with the claimed profiles layered over it. A claim or profile update swaps
+in a new snapshot over the same base.
+"""
+import base64
+import bisect
+import gzip
+import hashlib
+import html
+import json
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from compiled_catalog import CompiledCatalog, compiled_catalog_of
+from player_records import PlayerRecord
+from player_search import AUTOCOMPLETE_KINDS, PrefixIndex, TrigramIndex
+from player_table import MISSING, PlayerTable
+
+# Brotli is optional, responses fall back to gzip without it
+try:
+    import brotli
+    BROTLI_AVAILABLE = True
+except ImportError:
+    BROTLI_AVAILABLE = False
+
+CLAIMED_PLAYERS_FILE = 'backend/college/njcaa/clean_claimed_players.json'
+NJCAA_PLAYER_FILES = [
+    'backend/college/njcaa/njcaa_d1_players.json',
+    'backend/college/njcaa/njcaa_d2_players.json',
+    'backend/college/njcaa/njcaa_d3_players.json',
+]
+HIGHSCHOOL_PLAYERS_FILE = 'backend/college/highschool/highschool_players.json'
+STATIC_PLAYER_FILES = [CLAIMED_PLAYERS_FILE] + NJCAA_PLAYER_FILES + [HIGHSCHOOL_PLAYERS_FILE]
+
+# Built from STATIC_PLAYER_FILES by `python compiled_catalog.py`
+COMPILED_CATALOG_FILE = os.getenv('CATALOG_SNAPSHOT_FILE', 'backend/college/catalog.bin')
+
+# Team name -> logo URL, served by /api/team-logos and with player details
+TEAM_LOGOS_FILE = 'backend/college/njcaa/team_logos.json'
+
+_static_players = None
+_static_players_lock = threading.Lock()
+_team_logos = None
+
+
+def load_json(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def read_static_players():
+    """Parse the player JSON files into (claimed, unclaimed, highschool) PlayerRecord lists"""
+    derived_ids = set()
+
+    # Transfer - Claimed from JSON (legacy)
+    claimed = []
+    for p in load_json(CLAIMED_PLAYERS_FILE):
+        p['claimed'] = True
+        p['type'] = 'transfer'
+        p['source'] = 'json'
+        assign_player_id(p, derived_ids)
+        claimed.append(PlayerRecord.from_dict(p))
+
+    # Transfer - Unclaimed
+    unclaimed = []
+    for fname in NJCAA_PLAYER_FILES:
+        for p in load_json(fname):
+            p['claimed'] = False
+            p['type'] = 'transfer'
+            p['source'] = 'json'
+            unclaimed.append(PlayerRecord.from_dict(p))
+
+    # High School - Unclaimed
+    highschool = []
+    for p in load_json(HIGHSCHOOL_PLAYERS_FILE):
+        p['claimed'] = False
+        p['type'] = 'highschool'
+        p['source'] = 'json'
+        assign_player_id(p, derived_ids)
+        highschool.append(PlayerRecord.from_dict(p))
+
+    return claimed, unclaimed, highschool
+
+
+def assign_player_id(p, derived_ids):
+    """
+    Give a record without a playerId (legacy claimed and high school players)
+    its derived player_key() as playerId, so clients can look it up by id.
+    Records deriving the same key (same name, team and year) get a -2, -3...
+    suffix, in file order, to keep ids unique.
+    """
+    if p.get('playerId') or p.get('id'):
+        return
+    player_id = base_id = player_key(p)
+    n = 1
+    while player_id in derived_ids:
+        n += 1
+        player_id = f'{base_id}-{n}'
+    derived_ids.add(player_id)
+    p['playerId'] = player_id
+
+
+def open_compiled_catalog():
+    """The CompiledCatalog at COMPILED_CATALOG_FILE, or None if missing or stale"""
+    if not os.path.exists(COMPILED_CATALOG_FILE):
+        return None
+    try:
+        catalog = CompiledCatalog(COMPILED_CATALOG_FILE)
+    except (OSError, ValueError) as e:
+        print(f"ERROR: Could not open compiled catalog {COMPILED_CATALOG_FILE}: {e}")
+        return None
+    if not catalog.is_current(STATIC_PLAYER_FILES):
+        print(f"CATALOG: {COMPILED_CATALOG_FILE} is out of date, run `python compiled_catalog.py`")
+        return None
+    return catalog
+
+
+def load_static_players():
+    """
+    Load the players shipped with the repo.
+
+    Read from the compiled snapshot when there is an up-to-date one, from the
+    JSON files otherwise. The files never change while the process is running,
+    so they are loaded once and the records are shared by every snapshot as
+    compact read-only PlayerRecords. Returns (claimed, unclaimed, highschool)
+    lists.
+    """
+    global _static_players
+    if _static_players is not None:
+        return _static_players
+
+    with _static_players_lock:
+        if _static_players is not None:
+            return _static_players
+
+        compiled = open_compiled_catalog()
+        if compiled is not None:
+            claimed, unclaimed, highschool = compiled.players()
+            source = COMPILED_CATALOG_FILE
+        else:
+            claimed, unclaimed, highschool = read_static_players()
+            source = 'JSON'
+
+        print(f"CATALOG: Loaded {len(claimed)} claimed, {len(unclaimed)} unclaimed and {len(highschool)} high school players from {source}")
+        _static_players = (claimed, unclaimed, highschool)
+        return _static_players
+
+
+def load_team_logos():
+    """Team logos shipped with the repo, loaded once; {} if the file can't be read"""
+    global _team_logos
+    if _team_logos is None:
+        try:
+            _team_logos = load_json(TEAM_LOGOS_FILE)
+        except (OSError, ValueError) as e:
+            print(f"ERROR: Failed to load team logos from {TEAM_LOGOS_FILE}: {e}")
+            _team_logos = {}
+    return _team_logos
+
+
+def team_logo(p):
+    """Logo URL of a player's college team, None if there is no logo for it"""
+    team = p.get('team') or p.get('Current School')
+    return load_team_logos().get(team) if team else None
+
+
+def normalize_league(value):
+    """League filters are matched case-insensitively, ignoring stray whitespace"""
+    return (value or '').strip().lower()
+
+
+# Fields that /api/players can filter on, with the normalization applied to
+# both the indexed values and the requested filter value
+INDEXED_FIELDS = {
+    'type': None,
+    'league': normalize_league,
+    'position': None,
+    'nationality': None,
+    'state': None,
+    'grad_year': None,
+}
+
+
+def player_key(p):
+    """
+    Stable identifier of a player record, used to break sort ties and in cursors.
+
+    NJCAA and database-claimed records carry a playerId. The legacy claimed JSON
+    and the high school files don't, so a key is derived from their content;
+    read_static_players() stores it as their playerId.
+    """
+    player_id = p.get('playerId') or p.get('id')
+    if player_id:
+        return str(player_id)
+    parts = [
+        p.get('type') or '',
+        p.get('name') or p.get('Name') or '',
+        p.get('team') or p.get('club') or p.get('Current School') or '',
+        str(p.get('grad_year') or p.get('year') or p.get('Year of Birth') or ''),
+    ]
+    return 'x' + hashlib.sha1('|'.join(parts).encode('utf-8')).hexdigest()[:15]
+
+
+# Sortable fields and the record keys holding their value (first match wins),
+# since transfer, claimed and high school records don't share a schema
+SORT_FIELDS = {
+    'name': ('name', 'Name'),
+    'team': ('team', 'Current School', 'club'),
+    'league': ('league', 'Division Transferring From'),
+    'position': ('position', 'Position'),
+    'year': ('year', 'grad_year'),
+    'goals': ('goals',),
+    'assists': ('assists',),
+    'points': ('points',),
+    'games': ('games',),
+    'games_started': ('games_started',),
+    'minutes': ('minutes',),
+}
+DEFAULT_SORT = 'name'
+
+# NJCAA stats, stored as strings ("0") in the JSON files. They are parsed
+# once per snapshot into typed PlayerTable columns for range filters and
+# numeric sorts.
+STAT_FIELDS = ('goals', 'assists', 'points', 'games', 'games_started', 'minutes')
+NUMERIC_SORT_FIELDS = set(STAT_FIELDS)
+
+
+def parse_stat_range(minimum=None, maximum=None):
+    """
+    Turn ?min_<stat>=&max_<stat>= strings into an inclusive (min, max) filter
+    value, None when neither bound is set. Raises ValueError on bad input.
+    """
+    bounds = []
+    for bound in (minimum, maximum):
+        if bound is None or bound == '':
+            bounds.append(None)
+        elif bound.isdecimal():
+            bounds.append(int(bound))
+        else:
+            raise ValueError(f"Stat bounds must be non-negative integers, got '{bound}'")
+    if bounds == [None, None]:
+        return None
+    return tuple(bounds)
+
+
+def parse_sort(sort):
+    """Turn 'goals' / '-goals' into ('goals', descending); raises ValueError if unknown"""
+    field = sort[1:] if sort.startswith('-') else sort
+    if field not in SORT_FIELDS:
+        raise ValueError(f"Invalid sort '{sort}'. Must be one of: {', '.join(SORT_FIELDS)} (prefix with '-' for descending)")
+    return field, sort.startswith('-')
+
+
+def sort_value(p, field):
+    """Return the comparable value of a text `field`, or None when the record has none"""
+    for key in SORT_FIELDS[field]:
+        value = p.get(key)
+        if value is None or value == '':
+            continue
+        # Some scraped names still carry HTML entities (e.g. "&Aacute;lvaro")
+        return html.unescape(str(value)).strip().lower()
+    return None
+
+
+def sort_key(value, pkey, field, descending):
+    """
+    Total ordering key for `field`: (missing flag, value, player key).
+
+    The missing flag puts records without a value last in either direction,
+    and the player key makes the order deterministic across catalog versions.
+    """
+    if value is None:
+        return (0 if descending else 1, 0 if field in NUMERIC_SORT_FIELDS else '', pkey)
+    return (1 if descending else 0, value, pkey)
+
+
+# Named projections for ?view=. None means the full record.
+CARD_FIELDS = (
+    'playerId', 'type', 'claimed', 'claimed_by_user_id', 'source',
+    # Transfer records
+    'name', 'team', 'league', 'position', 'year', 'photo_url', 'goals',
+    # Claimed transfer records
+    'Name', 'Position', 'Current School', 'Division Transferring From',
+    'Year of Birth', 'Years of Eligibility Left', 'Individual Awards', 'Email Address',
+    # High school records
+    'club', 'grad_year', 'picture_url', 'state', 'commitment',
+)
+VIEWS = {
+    'card': CARD_FIELDS,
+    'detail': None,
+}
+DEFAULT_VIEW = 'detail'
+
+# Encoded projections kept per catalog base and per overlay (LRU)
+MAX_CACHED_PROJECTIONS = 32
+
+# Projections encoded eagerly when a snapshot is built
+PREENCODED_VIEWS = ('detail', 'card')
+
+# Records written per chunk by the streaming responses
+STREAM_BATCH_SIZE = 256
+
+
+def parse_projection(view=None, fields=None):
+    """
+    Resolve ?fields=a,b,c or ?view=name into a tuple of fields (None = everything).
+
+    An explicit field list wins over the view. Raises ValueError on an unknown view.
+    """
+    if fields:
+        projection = []
+        for field in fields.split(','):
+            field = field.strip()
+            if field and field not in projection:
+                projection.append(field)
+        if projection:
+            return tuple(projection)
+    view = view or DEFAULT_VIEW
+    if view not in VIEWS:
+        raise ValueError(f"Invalid view '{view}'. Must be one of: {', '.join(VIEWS)}")
+    return VIEWS[view]
+
+
+def project(p, fields):
+    """Copy of `p` restricted to `fields`, in that order, skipping absent keys"""
+    return {field: p[field] for field in fields if field in p}
+
+
+def encode_cursor(sort, key):
+    """Opaque cursor pointing just after the record with sort key `key`"""
+    payload = json.dumps([sort, list(key)], separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(payload).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Inverse of encode_cursor(), returns (sort, key); raises ValueError if malformed"""
+    try:
+        payload = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        sort, key = json.loads(payload)
+        field, _ = parse_sort(sort)
+        flag, value, pkey = key
+        value_type = int if field in NUMERIC_SORT_FIELDS else str
+        if flag not in (0, 1) or type(value) is not value_type or not isinstance(pkey, str):
+            raise ValueError
+    except (TypeError, ValueError):
+        raise ValueError('Invalid cursor')
+    return sort, (flag, value, pkey)
+
+
+# Encoded responses kept per snapshot (LRU), bounded by count and by the
+# bytes of their bodies plus compressed variants
+MAX_CACHED_RESPONSES = 256
+MAX_CACHED_RESPONSE_BYTES = int(os.getenv('MAX_CACHED_RESPONSE_BYTES', str(48 * 1024 * 1024)))
+
+# Larger bodies are sent without being cached; the unfiltered player list
+# (about 5MB) must stay below this, it is the most requested body
+MAX_CACHED_BODY_BYTES = 8 * 1024 * 1024
+
+# ResponseCache filters of a body that depends on every player
+ALL_PLAYERS = {}
+
+
+# Bodies smaller than this aren't worth compressing
+MIN_COMPRESS_SIZE = 1024
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 6
+
+# Settings for bodies built and compressed for a single request: most of the
+# size reduction for a fraction of the CPU
+FAST_GZIP_LEVEL = 1
+FAST_BROTLI_QUALITY = 1
+
+
+def compress(body, encoding, fast=False):
+    if encoding == 'br':
+        return brotli.compress(body, quality=FAST_BROTLI_QUALITY if fast else BROTLI_QUALITY)
+    if encoding == 'gzip':
+        return gzip.compress(body, compresslevel=FAST_GZIP_LEVEL if fast else GZIP_LEVEL, mtime=0)
+    raise ValueError(f'Unsupported encoding {encoding}')
+
+
+class CachedResponse:
+    """
+    Encoded JSON body plus its strong ETag (a hash of the bytes).
+
+    Compressed variants are produced on first request and kept next to the
+    raw bytes, so every later request is served without compression CPU.
+    fast=True compresses with the cheap settings, for bodies that are built
+    for one request and never cached.
+    """
+
+    __slots__ = ('body', 'etag', 'fast', '_variants')
+
+    def __init__(self, body, fast=False):
+        self.body = body
+        self.etag = hashlib.sha1(body).hexdigest()[:20]
+        self.fast = fast
+        self._variants = {}
+
+    def negotiate(self, accepted):
+        """
+        Pick the best encoding for an Accept-Encoding quality lookup
+        (e.g. werkzeug's request.accept_encodings) and return
+        (encoding or None, body bytes, etag).
+        """
+        if len(self.body) >= MIN_COMPRESS_SIZE:
+            for encoding in ('br', 'gzip'):
+                if encoding == 'br' and not BROTLI_AVAILABLE:
+                    continue
+                if accepted[encoding] > 0:
+                    return encoding, self.variant(encoding), f'{self.etag}-{encoding}'
+        return None, self.body, self.etag
+
+    @property
+    def size(self):
+        """Bytes held: the body plus the compressed variants produced so far"""
+        return len(self.body) + sum(len(body) for body in list(self._variants.values()))
+
+    def variant(self, encoding):
+        body = self._variants.get(encoding)
+        if body is None:
+            # A concurrent miss compresses twice at worst, the result is identical
+            body = compress(self.body, encoding, self.fast)
+            self._variants[encoding] = body
+        return body
+
+
+class ResponseCache:
+    """
+    Small thread-safe LRU of CachedResponse keyed by a normalized query.
+
+    Each snapshot owns one, so a version bump drops every cached body at once,
+    except for the entries carry_over() copies into the next snapshot. ETags
+    hash the bytes rather than the version, which keeps them identical across
+    workers and across rebuilds that didn't change the result.
+    """
+
+    def __init__(self, max_entries=MAX_CACHED_RESPONSES, max_bytes=MAX_CACHED_RESPONSE_BYTES):
+        self._entries = OrderedDict()
+        self._max_entries = max_entries
+        self._max_bytes = max_bytes
+        self._lock = threading.Lock()
+
+    def get(self, key, build, filters=ALL_PLAYERS):
+        """
+        Return the cached response for `key`, encoding `build()` on a miss.
+
+        `filters` says which players the body depends on: the players matching
+        those filters ({} for all of them), or None for a body that doesn't
+        depend on the players at all.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                return entry[0]
+
+        cached = CachedResponse(build())
+        if len(cached.body) > MAX_CACHED_BODY_BYTES:
+            return cached
+        with self._lock:
+            self._entries[key] = (cached, filters)
+            self._trim()
+        return cached
+
+    def _trim(self):
+        # Called with the lock held. Variants grow entries after they are
+        # added, so the byte total is recounted rather than kept running
+        total = sum(entry[0].size for entry in self._entries.values())
+        while self._entries and (len(self._entries) > self._max_entries or total > self._max_bytes):
+            _, (evicted, _) = self._entries.popitem(last=False)
+            total -= evicted.size
+
+    def carry_over(self, previous, affected):
+        """
+        Copy the entries of `previous` (the cache of the snapshot being
+        replaced) that don't depend on a changed player. `affected(filters)`
+        tells whether a changed player matches an entry's filters.
+        """
+        with previous._lock:
+            entries = list(previous._entries.items())
+        kept = [(key, entry) for key, entry in entries if entry[1] is None or not affected(entry[1])]
+        with self._lock:
+            for key, entry in kept:
+                self._entries.setdefault(key, entry)
+            self._trim()
+        return len(kept)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+def encode_json(payload):
+    """Compact JSON bytes for API responses"""
+    return json.dumps(payload, separators=(',', ':')).encode('utf-8')
+
+
+def encode_record(p, fields=None):
+    """JSON bytes of one player, restricted to `fields` (None for the full record)"""
+    return encode_json(p.to_dict() if fields is None else project(p, fields))
+
+
+def encode_players_payload(fragments, **fields):
+    """
+    Encode {"players": [...], **fields} where the players are already encoded.
+
+    Matches encode_json() output, but the players array is a plain join of the
+    fragments instead of a fresh serialization.
+    """
+    tail = encode_json(fields)
+    parts = [b'{"players":[', b','.join(fragments), b']']
+    parts.append(b',' + tail[1:] if fields else b'}')
+    return b''.join(parts)
+
+
+class FragmentBuffer:
+    """
+    Per-player JSON fragments packed into one bytes buffer plus an offsets array.
+
+    A tuple of 14k bytes objects has 14k reference counts that every response
+    bumps; once the catalog is shared copy-on-write between forked gunicorn
+    workers (see gunicorn.conf.py), each bump dirties a shared page. Here the
+    fragments are a single buffer read through memoryview slices. Views
+    compiled into the catalog file use its sections as the buffer and
+    offsets (see from_sections()), so they stay in the page cache.
+    """
+    __slots__ = ('data', 'offsets', '_view')
+
+    def __init__(self, fragments):
+        fragments = list(fragments)
+        self.data = b''.join(fragments)
+        self.offsets = np.zeros(len(fragments) + 1, dtype=np.int64)
+        np.cumsum([len(fragment) for fragment in fragments], out=self.offsets[1:])
+        self._view = memoryview(self.data)
+
+    @classmethod
+    def from_sections(cls, data, offsets):
+        """Wrap an existing buffer (e.g. a memoryview of the mmap'ed catalog) and its offsets array"""
+        buffer = cls.__new__(cls)
+        buffer.data = data
+        buffer.offsets = offsets
+        buffer._view = memoryview(data)
+        return buffer
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, row):
+        return self._view[self.offsets[row]:self.offsets[row + 1]]
+
+    def take(self, rows):
+        """Fragments at `rows` as a list of memoryviews"""
+        rows = np.asarray(rows, dtype=np.int64)
+        view = self._view
+        starts = self.offsets[rows].tolist()
+        ends = self.offsets[rows + 1].tolist()
+        return [view[start:end] for start, end in zip(starts, ends)]
+
+
+class ProjectionCache:
+    """Small thread-safe LRU of the fragments encoded for each projection"""
+
+    def __init__(self, max_entries=MAX_CACHED_PROJECTIONS):
+        self._entries = OrderedDict()
+        self._max_entries = max_entries
+        self._lock = threading.Lock()
+
+    def __contains__(self, fields):
+        return fields in self._entries
+
+    def get(self, fields, build):
+        """Return the fragments of projection `fields`, from `build()` on a miss"""
+        with self._lock:
+            fragments = self._entries.get(fields)
+            if fragments is not None:
+                self._entries.move_to_end(fields)
+                return fragments
+
+        fragments = build()
+        with self._lock:
+            self._entries[fields] = fragments
+            while len(self._entries) > self._max_entries:
+                self._entries.popitem(last=False)
+        return fragments
+
+
+# Fields the filter columns and sort orders of a compiled catalog were built
+# for; they are rebuilt in process when these change
+INDEX_LAYOUT = {'categorical': list(INDEXED_FIELDS), 'stats': list(STAT_FIELDS), 'sorts': list(SORT_FIELDS)}
+
+
+def sort_order_name(field, descending):
+    return f'-{field}' if descending else field
+
+
+class SortKeys:
+    """
+    Read-only sequence of the sort keys of a presorted rows array, each
+    computed on access. Bisecting a cursor reads a handful of them, so sort
+    orders read from a compiled catalog don't need the list of key tuples
+    that sorting in process produces.
+    """
+
+    __slots__ = ('_base', '_field', '_descending', '_rows')
+
+    def __init__(self, base, field, descending, rows):
+        self._base = base
+        self._field = field
+        self._descending = descending
+        self._rows = rows
+
+    def __len__(self):
+        return len(self._rows)
+
+    def __getitem__(self, position):
+        return self._base.sort_key_at(int(self._rows[position]), self._field, self._descending)
+
+
+class CatalogBase:
+    """
+    Immutable players of the catalog plus their filter, sort and text indexes.
+
+    Built from the static player files only; claims are layered on top by
+    CatalogSnapshot, so a claim never rebuilds any of this. Over the records
+    of a compiled catalog, the filter columns and sort orders are NumPy arrays
+    read in place from its mapping, shared by every process through the page
+    cache.
+    """
+
+    def __init__(self, version, players):
+        self.version = version
+        self.players = tuple(PlayerRecord.from_dict(p) for p in players)
+        self._compiled = compiled_catalog_of(self.players)
+        self._index_arrays = None
+        indexes = self._compiled.indexes() if self._compiled is not None else None
+        if indexes is not None and indexes[1]['layout'] == INDEX_LAYOUT:
+            self._index_arrays, meta = indexes
+            self.table = PlayerTable.from_columns(
+                len(self.players), INDEXED_FIELDS, meta['categories'],
+                {field: self._index_arrays[f'codes.{field}'] for field in INDEXED_FIELDS},
+                {stat: self._index_arrays[f'stats.{stat}'] for stat in STAT_FIELDS},
+            )
+        else:
+            self.table = PlayerTable(self.players, INDEXED_FIELDS, STAT_FIELDS)
+        self.player_keys = [player_key(p) for p in self.players]
+        # Row of each player_key() (playerId or derived key), for lookups by id;
+        # the first of duplicate records wins
+        self.rows_by_key = {}
+        for row, key in enumerate(self.player_keys):
+            self.rows_by_key.setdefault(key, row)
+        # Rows a claim can shadow: unclaimed records, by playerId
+        self.rows_by_player_id = {}
+        for row, p in enumerate(self.players):
+            player_id = p.get('playerId') or p.get('id')
+            if player_id and not p.get('claimed'):
+                self.rows_by_player_id.setdefault(str(player_id), []).append(row)
+        self._sort_orders = {}
+        self._fragments = ProjectionCache()
+        self._search_index = None
+        self._prefix_indexes = {}
+        self._lazy_lock = threading.Lock()
+        for view in PREENCODED_VIEWS:
+            self.fragments(VIEWS[view])
+
+    def __len__(self):
+        return len(self.players)
+
+    def warm(self):
+        """
+        Build the indexes that are otherwise built on first use: the search
+        and prefix indexes, and the sort orders unless they were compiled in.
+        Called by a preloading gunicorn master so the workers share them
+        instead of each building its own copy.
+        """
+        self.search_index
+        for kind in AUTOCOMPLETE_KINDS:
+            self.prefix_index(kind)
+        for field in SORT_FIELDS:
+            for descending in (False, True):
+                self.sort_order(field, descending)
+
+    @property
+    def search_index(self):
+        """TrigramIndex over the base, built on first search"""
+        if self._search_index is None:
+            with self._lazy_lock:
+                if self._search_index is None:
+                    self._search_index = TrigramIndex(self.players)
+        return self._search_index
+
+    def prefix_index(self, kind):
+        """PrefixIndex for one AUTOCOMPLETE_KINDS kind, built on first use"""
+        index = self._prefix_indexes.get(kind)
+        if index is None:
+            with self._lazy_lock:
+                index = self._prefix_indexes.get(kind)
+                if index is None:
+                    index = PrefixIndex.from_players(self.players, AUTOCOMPLETE_KINDS[kind])
+                    self._prefix_indexes[kind] = index
+        return index
+
+    def mask(self, filters):
+        """
+        Fresh boolean mask of the rows matching every {field: value} filter.
+
+        INDEXED_FIELDS take a value; STAT_FIELDS take an inclusive (min, max)
+        range from parse_stat_range(). Vectorized over the PlayerTable columns.
+        """
+        if not filters:
+            return np.ones(len(self.players), dtype=bool)
+        return self.table.mask(filters)
+
+    def fragments(self, fields=None):
+        """
+        Every player encoded to JSON bytes, restricted to `fields` (a tuple from
+        parse_projection(), None for full records).
+
+        Records are encoded once per base and projection into a
+        FragmentBuffer; projections compiled into the catalog file are read
+        in place from it instead. Responses are then assembled by joining
+        fragments.
+        """
+        def build():
+            sections = self._compiled_sections(fields)
+            if sections is not None:
+                return FragmentBuffer.from_sections(*sections)
+            return FragmentBuffer(p.fragment(fields) or encode_record(p, fields) for p in self.players)
+
+        return self._fragments.get(fields, build)
+
+    def _compiled_sections(self, fields):
+        return self._compiled.fragment_sections(fields) if self._compiled is not None else None
+
+    def has_fragments(self, fields=None):
+        """True if fragments(fields) is ready without encoding every player"""
+        return fields in self._fragments or self._compiled_sections(fields) is not None
+
+    def sort_order(self, field, descending):
+        """
+        Presorted (keys, rows, ranks) for one sort, built on first use.
+
+        keys/rows are in ascending key order; ranks[row] is the row's position
+        in that order. Descending sorts are read back to front. keys stay a
+        list of tuples so cursors can be bisected; rows and ranks are arrays.
+        """
+        order = self._sort_orders.get((field, descending))
+        if order is None:
+            name = sort_order_name(field, descending)
+            if self._index_arrays is not None:
+                # Compiled in: nothing to sort, keys are computed when read
+                rows = self._index_arrays[f'sort_rows.{name}']
+                ranks = self._index_arrays[f'sort_ranks.{name}']
+                keys = SortKeys(self, field, descending, rows)
+            else:
+                if field in self.table.stats:
+                    values = [None if value == MISSING else value for value in self.table.stats[field].tolist()]
+                else:
+                    values = [sort_value(p, field) for p in self.players]
+                keyed = sorted(
+                    (sort_key(value, pkey, field, descending), row)
+                    for row, (value, pkey) in enumerate(zip(values, self.player_keys))
+                )
+                keys = [key for key, _ in keyed]
+                rows = np.fromiter((row for _, row in keyed), dtype=np.int64, count=len(keyed))
+                ranks = np.empty(len(rows), dtype=np.int64)
+                ranks[rows] = np.arange(len(rows))
+            order = (keys, rows, ranks)
+            self._sort_orders[(field, descending)] = order
+        return order
+
+    def sort_key_at(self, row, field, descending):
+        """sort_key() of one row, the same sort_order() sorts by"""
+        if field in self.table.stats:
+            value = int(self.table.stats[field][row])
+            value = None if value == MISSING else value
+        else:
+            value = sort_value(self.players[row], field)
+        return sort_key(value, self.player_keys[row], field, descending)
+
+    def index_sections(self):
+        """
+        The filter columns and every sort order as (arrays, meta), for
+        write_compiled_catalog(). A base over the compiled records reads
+        them back in place instead of building them.
+        """
+        arrays = {}
+        for field in INDEXED_FIELDS:
+            arrays[f'codes.{field}'] = self.table.codes[field]
+        for stat in STAT_FIELDS:
+            arrays[f'stats.{stat}'] = self.table.stats[stat]
+        for field in SORT_FIELDS:
+            for descending in (False, True):
+                _, rows, ranks = self.sort_order(field, descending)
+                name = sort_order_name(field, descending)
+                arrays[f'sort_rows.{name}'] = rows
+                arrays[f'sort_ranks.{name}'] = ranks
+        categories = {
+            field: [[value, label] for value, label in zip(self.table.categories[field], self.table.labels[field])]
+            for field in INDEXED_FIELDS
+        }
+        return arrays, {'layout': INDEX_LAYOUT, 'categories': categories}
+
+    def page_positions(self, rows, field, descending, limit=None, after=None):
+        """
+        Sort positions (see sort_order()) of the first limit + 1 of `rows`
+        after the cursor key `after`, in page order.
+        """
+        keys, _, ranks = self.sort_order(field, descending)
+        total = len(keys)
+
+        # Positions in ascending key order that come after the cursor
+        if descending:
+            start, stop = 0, (bisect.bisect_left(keys, after) if after is not None else total)
+        else:
+            start, stop = (bisect.bisect_right(keys, after) if after is not None else 0), total
+
+        if len(rows) == total:
+            positions = np.arange(start, stop)
+        else:
+            positions = ranks[rows]
+            positions = positions[(positions >= start) & (positions < stop)]
+
+        # Top-K by partial sort when a page is requested, full sort otherwise
+        wanted = len(positions) if limit is None else min(limit + 1, len(positions))
+        if wanted < len(positions):
+            if descending:
+                positions = np.partition(positions, len(positions) - wanted)[-wanted:]
+            else:
+                positions = np.partition(positions, wanted - 1)[:wanted]
+        positions = np.sort(positions)
+        return positions[::-1] if descending else positions
+
+
+def overlay_player_id(p):
+    """playerId an overlay claim is matched on (the unclaimed record it hides, the claim it replaces)"""
+    return str(p.get('playerId') or p.get('id') or '')
+
+
+class CatalogSnapshot:
+    """
+    One catalog version: an immutable CatalogBase plus an overlay of claims.
+
+    Overlay records (claimed profiles from the database) get row ids after the
+    base rows and come first in catalog order. Base rows for the same playerId
+    are hidden. Every query runs on the base indexes and on the few overlay
+    records, and the two results are merged, so a new claim costs a new
+    overlay rather than a rebuild of the base.
+    """
+
+    def __init__(self, version, base, overlay=()):
+        self.version = version
+        self.base = base
+        self.overlay = tuple(PlayerRecord.from_dict(p) for p in overlay)
+        self.base_size = len(base)
+        hidden = []
+        for p in self.overlay:
+            hidden.extend(base.rows_by_player_id.get(overlay_player_id(p), ()))
+        self.hidden = np.array(sorted(set(hidden)), dtype=np.int64)
+        self.overlay_table = PlayerTable(self.overlay, INDEXED_FIELDS, STAT_FIELDS)
+        self.overlay_keys = [player_key(p) for p in self.overlay]
+        self.overlay_rows_by_key = {key: self.base_size + i for i, key in enumerate(self.overlay_keys)}
+        self._overlay_fragments = ProjectionCache()
+        self._overlay_search_index = None
+        self._overlay_prefix_indexes = {}
+        self.responses = ResponseCache()
+
+    def __len__(self):
+        return self.base_size - len(self.hidden) + len(self.overlay)
+
+    def with_overlay(self, version, overlay):
+        """
+        Snapshot `version` with `overlay` layered over the same base, or None
+        if the overlay is unchanged.
+
+        Claims already in the overlay keep their place and new ones go last.
+        Cached responses that no changed claim (nor the record it shadows)
+        can appear in are carried over to the new snapshot.
+        """
+        incoming = {overlay_player_id(p): p for p in overlay}
+        merged = []
+        changed = []
+        for p in self.overlay:
+            player_id = overlay_player_id(p)
+            new = incoming.pop(player_id, None)
+            if new is None:
+                changed.append(p)
+                changed.extend(self.base.players[row] for row in self.base.rows_by_player_id.get(player_id, ()))
+            elif new == p:
+                merged.append(p)
+            else:
+                merged.append(new)
+                changed.extend((p, new))
+        for player_id, new in incoming.items():
+            merged.append(new)
+            changed.append(new)
+            changed.extend(self.base.players[row] for row in self.base.rows_by_player_id.get(player_id, ()))
+        if not changed:
+            return None
+
+        snapshot = CatalogSnapshot(version, self.base, merged)
+        changed = PlayerTable(changed, INDEXED_FIELDS, STAT_FIELDS)
+        snapshot.responses.carry_over(self.responses, lambda filters: changed.mask(filters).any())
+        return snapshot
+
+    def find(self, key):
+        """
+        Row id of the visible player with this player_key() (its playerId, or
+        the derived key of records without one), None if there is none.
+        Claims are looked up first, so they win over the record they hide.
+        """
+        row = self.overlay_rows_by_key.get(key)
+        if row is None:
+            row = self.base.rows_by_key.get(key)
+        return row
+
+    def record(self, row):
+        """Player at row id `row`"""
+        if row >= self.base_size:
+            return self.overlay[row - self.base_size]
+        return self.base.players[row]
+
+    def _base_mask(self, filters):
+        mask = self.base.mask(filters)
+        mask[self.hidden] = False
+        return mask
+
+    def select(self, filters):
+        """
+        Return the row ids matching every {field: value} filter, in catalog
+        order (see CatalogBase.mask() for the filter values).
+        """
+        base_rows = np.flatnonzero(self._base_mask(filters))
+        if not self.overlay:
+            return base_rows
+        overlay_rows = np.flatnonzero(self.overlay_table.mask(filters)) + self.base_size
+        return np.concatenate([overlay_rows, base_rows])
+
+    def facets(self, filters, fields=None):
+        """
+        Count players per value of each facet field under `filters`.
+
+        Each field is counted against the other filters only, so the counts
+        show what selecting another value of that field would return. Counts
+        are a bincount of the field's codes under the filter mask.
+        Returns {field: [{'value': label, 'count': n}]}, most common first.
+        """
+        facets = {}
+        for field in fields or INDEXED_FIELDS:
+            others = {key: value for key, value in filters.items() if key != field}
+            counts = {}
+            tables = [(self.base.table, self._base_mask(others))]
+            if self.overlay:
+                tables.append((self.overlay_table, self.overlay_table.mask(others)))
+            for table, mask in tables:
+                for value, label, count in table.counts(field, mask):
+                    label, total = counts.get(value, (label, 0))
+                    counts[value] = (label, total + count)
+            counts = [(label, count) for label, count in counts.values() if label]
+            counts.sort(key=lambda item: (-item[1], str(item[0])))
+            facets[field] = [{'value': label, 'count': count} for label, count in counts]
+        return facets
+
+    def search(self, query, limit=20, filters=None):
+        """Return [(row, score)] for the best `limit` matches of `query` under `filters`"""
+        results = self.base.search_index.search(
+            query, limit=limit, allowed=self._base_mask(filters) if filters or len(self.hidden) else None
+        )
+        if self.overlay:
+            if self._overlay_search_index is None:
+                self._overlay_search_index = TrigramIndex(self.overlay)
+            allowed = self.overlay_table.mask(filters) if filters else None
+            results += [
+                (row + self.base_size, score)
+                for row, score in self._overlay_search_index.search(query, limit=limit, allowed=allowed)
+            ]
+            results = sorted(results, key=lambda item: (-item[1], item[0]))[:limit]
+        return results
+
+    def complete(self, kind, prefix, limit=10):
+        """Return [(value, count)] autocomplete suggestions of one AUTOCOMPLETE_KINDS kind"""
+        completions = self.base.prefix_index(kind).complete(prefix, limit)
+        if not self.overlay:
+            return completions
+        index = self._overlay_prefix_indexes.get(kind)
+        if index is None:
+            index = self._overlay_prefix_indexes[kind] = PrefixIndex.from_players(self.overlay, AUTOCOMPLETE_KINDS[kind])
+        # A claim usually shadows a base record of the same value, so the
+        # larger count is kept rather than the sum
+        merged = dict(completions)
+        for value, count in index.complete(prefix, limit):
+            merged[value] = max(merged.get(value, 0), count)
+        return sorted(merged.items(), key=lambda item: (-item[1], item[0]))[:limit]
+
+    def fragments(self, rows, fields=None):
+        """JSON fragments of the players at `rows`, for projection `fields`"""
+        rows = np.asarray(rows, dtype=np.int64)
+        base_fragments = self.base.fragments(fields)
+        in_base = rows < self.base_size
+        if not self.overlay or in_base.all():
+            return base_fragments.take(rows)
+
+        overlay_fragments = self._overlay_fragments.get(
+            fields, lambda: [encode_record(p, fields) for p in self.overlay]
+        )
+        taken = iter(base_fragments.take(rows[in_base]))
+        return [
+            next(taken) if is_base else overlay_fragments[row - self.base_size]
+            for row, is_base in zip(rows.tolist(), in_base.tolist())
+        ]
+
+    def lookup_fragments(self, rows, fields=None):
+        """
+        fragments() for a few rows looked up by id: a projection that isn't
+        built yet is encoded for these rows only, not for the whole catalog
+        """
+        if self.base.has_fragments(fields):
+            return self.fragments(rows, fields)
+        return [encode_record(self.record(row), fields) for row in rows]
+
+    def encode_players(self, rows, fields=None, **extra):
+        """Encode {"players": [players at rows], **extra} from cached fragments"""
+        return encode_players_payload(self.fragments(rows, fields), **extra)
+
+    def _fragment_batches(self, rows, fields):
+        for start in range(0, len(rows), STREAM_BATCH_SIZE):
+            yield self.fragments(rows[start:start + STREAM_BATCH_SIZE], fields)
+
+    def stream_players(self, rows, fields=None, **extra):
+        """
+        Generator version of encode_players(): yields the same document in
+        chunks, so memory stays flat however many rows are selected.
+        """
+        yield b'{"players":['
+        separator = b''
+        for batch in self._fragment_batches(rows, fields):
+            yield separator + b','.join(batch)
+            separator = b','
+        tail = encode_json(extra)
+        yield b'],' + tail[1:] if extra else b']}'
+
+    def stream_ndjson(self, rows, fields=None):
+        """Yield the players at `rows` as newline-delimited JSON, in chunks"""
+        for batch in self._fragment_batches(rows, fields):
+            yield b'\n'.join(batch) + b'\n'
+
+    def _overlay_sort_keys(self, field, descending):
+        if field in self.overlay_table.stats:
+            values = [None if value == MISSING else value for value in self.overlay_table.stats[field].tolist()]
+        else:
+            values = [sort_value(p, field) for p in self.overlay]
+        return [sort_key(value, pkey, field, descending) for value, pkey in zip(values, self.overlay_keys)]
+
+    def page(self, rows, sort, limit=None, after=None):
+        """
+        Order `rows` (from select()) by `sort` and return (page_rows, next_key).
+
+        `after` is the sort key of the last record the client has seen. Keys
+        identify records rather than positions, so a cursor taken from an older
+        snapshot keeps its place. next_key is None on the last page.
+        """
+        field, descending = parse_sort(sort)
+        rows = np.asarray(rows, dtype=np.int64)
+        in_base = rows < self.base_size
+        keys, ordered_rows, _ = self.base.sort_order(field, descending)
+        positions = self.base.page_positions(rows[in_base], field, descending, limit, after)
+
+        overlay = []
+        if not in_base.all():
+            overlay_keys = self._overlay_sort_keys(field, descending)
+            for row in rows[~in_base].tolist():
+                key = overlay_keys[row - self.base_size]
+                if after is None or (key < after if descending else key > after):
+                    overlay.append((key, row))
+
+        if not overlay:
+            page_keys = None
+            page_rows = ordered_rows[positions]
+        else:
+            # Each overlay record goes just before the first base position
+            # whose key is not smaller; overlay records sharing that slot are
+            # ordered by key
+            overlay.sort()
+            slots = np.array([bisect.bisect_left(keys, key) - 0.5 for key, _ in overlay])
+            order_positions = np.concatenate([positions.astype(float), slots])
+            tiebreak = np.concatenate([np.zeros(len(positions)), np.arange(len(overlay))])
+            order = np.lexsort((tiebreak, order_positions))
+            if descending:
+                order = order[::-1]
+            page_keys = [keys[p] for p in positions.tolist()] + [key for key, _ in overlay]
+            page_keys = [page_keys[i] for i in order.tolist()]
+            page_rows = np.concatenate([ordered_rows[positions], np.array([row for _, row in overlay])])[order]
+
+        next_key = None
+        if limit is not None and len(page_rows) > limit:
+            page_rows = page_rows[:limit]
+            next_key = page_keys[limit - 1] if page_keys is not None else keys[positions[limit - 1]]
+
+        return page_rows.tolist(), next_key
+
+
+class PlayerCatalog:
+    """
+    Holds the current CatalogSnapshot.
+
+    `loader` is a callable returning the base list of player dicts; the base
+    is built from it once, on the first read. Claims are layered on top with
+    set_overlay() and patch(), which swap in a new snapshot over the same
+    base. Reads are lock-free once the base is built.
+    """
+
+    def __init__(self, loader):
+        self._loader = loader
+        self._version = 1
+        self._overlay = ()
+        self._snapshot = None
+        self._version_lock = threading.Lock()
+        self._build_lock = threading.Lock()
+
+    @property
+    def version(self):
+        return self._version
+
+    def set_overlay(self, players):
+        """
+        Replace the claims layered over the base and swap in a snapshot with
+        them. Only the overlay is indexed; the base is reused as is.
+        """
+        with self._version_lock:
+            return self._swap_overlay(players)
+
+    def patch(self, players):
+        """
+        Write-through for claims just saved to the database: put `players`
+        into the overlay, replacing claims with the same playerId, without
+        waiting for the next claimed profiles refresh.
+        """
+        with self._version_lock:
+            patched = {overlay_player_id(p): p for p in players}
+            overlay = [patched.pop(overlay_player_id(p), p) for p in self._overlay]
+            return self._swap_overlay(overlay + list(patched.values()))
+
+    def _swap_overlay(self, players):
+        # Called with the version lock held
+        snapshot = self._snapshot
+        if snapshot is None:
+            # The base isn't built yet; snapshot() picks the overlay up
+            self._version += 1
+            self._overlay = tuple(players)
+            return self._version
+
+        # Patch the current snapshot, keeping the cached responses the change can't affect
+        patched = snapshot.with_overlay(self._version + 1, players)
+        if patched is None:
+            return self._version
+        self._version += 1
+        self._overlay = patched.overlay
+        self._snapshot = patched
+        return self._version
+
+    def snapshot(self):
+        """Return the current snapshot, building the base on the first call"""
+        snapshot = self._snapshot
+        if snapshot is not None:
+            return snapshot
+
+        # Nothing to serve yet, everyone waits for the first build
+        with self._build_lock:
+            if self._snapshot is None:
+                base = CatalogBase(self._version, self._loader())
+                print(f"CATALOG: Built base v{base.version} with {len(base)} players")
+                with self._version_lock:
+                    self._snapshot = CatalogSnapshot(self._version, base, self._overlay)
+            return self._snapshot
+
+
+class BackgroundRefresher:
+    """
+    Keeps the last good result of `fetch` and refreshes it on a daemon thread.
+
+    value() never blocks on `fetch`: it returns `initial` until the first fetch
+    succeeds and the previous result while a refresh is running or after one
+    failed. `fetch` refreshes every `interval` seconds or when refresh_now() is
+    called; `on_change` runs on the refresher thread when the result changes.
+
+    The thread is started by start(), per process, so a gunicorn master that
+    preloads the app does not start one that its workers would not inherit.
+    ready is False until a fetch has succeeded in this process's lifetime;
+    wait_ready() lets a new worker hold off serving until then.
+    """
+
+    def __init__(self, fetch, interval, on_change=None, initial=None, name='refresher'):
+        self._fetch = fetch
+        self._interval = interval
+        self._on_change = on_change
+        self._value = initial
+        self._name = name
+        self._wakeup = threading.Event()
+        self._ready = threading.Event()
+        self._start_lock = threading.Lock()
+        self._pid = None
+
+    def value(self):
+        return self._value
+
+    @property
+    def ready(self):
+        """True once a fetch has succeeded"""
+        return self._ready.is_set()
+
+    def wait_ready(self, timeout):
+        """Block until a fetch has succeeded or `timeout` seconds passed; returns ready"""
+        return self._ready.wait(timeout)
+
+    def start(self):
+        """Start the refresh thread in this process if it isn't running yet"""
+        if self._pid == os.getpid():
+            return
+        with self._start_lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._wakeup = threading.Event()
+            threading.Thread(target=self._run, name=self._name, daemon=True).start()
+
+    def refresh_now(self):
+        """Ask the refresh thread for an immediate refresh"""
+        self._wakeup.set()
+
+    def refresh(self):
+        """Fetch now on the calling thread; returns True if the value changed"""
+        try:
+            value = self._fetch()
+        except Exception as e:
+            print(f"ERROR: {self._name} refresh failed, keeping the last good value: {e}")
+            return False
+        if value == self._value:
+            self._ready.set()
+            return False
+        self._value = value
+        if self._on_change is not None:
+            try:
+                self._on_change()
+            except Exception as e:
+                print(f"ERROR: {self._name} change handler failed: {e}")
+        # Set after on_change, so a ready refresher's value is also applied
+        self._ready.set()
+        return True
+
+    def _run(self):
+        while True:
+            self.refresh()
+            self._wakeup.wait(self._interval)
+            self._wakeup.clear()
+
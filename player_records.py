@@ -0,0 +1,105 @@
+"""
+Compact read-only player records.
+
+The JSON files hold ~14k players in three shapes (claimed transfer, NJCAA,
+high school). As plain dicts every record carries its own hash table, and
+values like team names, leagues and 'N/A' are separate string objects per
+player. PlayerRecord keeps only a values tuple per player plus a reference to
+a key schema shared by all records of the same shape, and categorical values
+are interned so each distinct string exists once per process.
+"""
+import sys
+from collections.abc import Mapping
+
+# Low-cardinality fields whose values are interned. Free text (names, bios,
+# emails) is left alone: interned strings live as long as the process.
+INTERNED_FIELDS = {
+    'type', 'source', 'league', 'position', 'year', 'height', 'weight',
+    'team', 'club', 'state', 'grad_year', 'hometown', 'photo_url', 'commitment',
+    'goals', 'assists', 'points', 'games', 'games_started', 'minutes',
+    'Position', 'Nationality', 'Division Transferring From', 'Current School',
+    'Available', 'Finances', 'Height', 'Weight (lbs)', 'Years of Eligibility Left',
+    'Strongest Foot', 'Individual Awards', 'Interested in religious schools?',
+    'Do They have permission to transfer?', 'Release letter',
+}
+
+# Placeholder values interned whatever the field
+INTERNED_VALUES = {'N/A', 'n/a', 'None', 'TBD', '0'}
+
+_schemas = {}
+
+
+class RecordSchema:
+    """Key order of one record shape and key -> position lookup"""
+    __slots__ = ('keys', 'positions')
+
+    def __init__(self, keys):
+        self.keys = keys
+        self.positions = {key: i for i, key in enumerate(keys)}
+
+
+def record_schema(keys):
+    """Shared RecordSchema for a tuple of keys"""
+    schema = _schemas.get(keys)
+    if schema is None:
+        keys = tuple(sys.intern(key) for key in keys)
+        schema = _schemas.setdefault(keys, RecordSchema(keys))
+    return schema
+
+
+def intern_value(key, value):
+    if type(value) is str and (key in INTERNED_FIELDS or value in INTERNED_VALUES):
+        return sys.intern(value)
+    return value
+
+
+class PlayerRecord(Mapping):
+    """
+    Immutable mapping over a shared key schema.
+
+    Supports the dict reads the API does on players (get, [], in, items,
+    iteration); use to_dict() where a real dict is needed, e.g. for
+    json.dumps.
+    """
+    __slots__ = ('_schema', '_values')
+
+    def __init__(self, schema, values):
+        self._schema = schema
+        self._values = values
+
+    @classmethod
+    def from_dict(cls, p):
+        """Compact copy of a player dict, interning its categorical values"""
+        if isinstance(p, PlayerRecord):
+            return p
+        schema = record_schema(tuple(p))
+        return cls(schema, tuple(intern_value(key, value) for key, value in p.items()))
+
+    def __getitem__(self, key):
+        return self._values[self._schema.positions[key]]
+
+    def get(self, key, default=None):
+        i = self._schema.positions.get(key)
+        return default if i is None else self._values[i]
+
+    def __contains__(self, key):
+        return key in self._schema.positions
+
+    def __iter__(self):
+        return iter(self._schema.keys)
+
+    def __len__(self):
+        return len(self._values)
+
+    def items(self):
+        return zip(self._schema.keys, self._values)
+
+    def fragment(self, fields):
+        """Pre-encoded JSON bytes for a projection, None if not available"""
+        return None
+
+    def to_dict(self):
+        return dict(zip(self._schema.keys, self._values))
+
+    def __repr__(self):
+        return f'PlayerRecord({self.to_dict()!r})'
@@ -0,0 +1,196 @@
+"""
+Text indexes over the player catalog.
+
+TrigramIndex backs /api/players/search: typo-tolerant lookup of players by
+name, team/club and hometown. PrefixIndex backs /api/autocomplete. Indexes
+are built once per catalog snapshot.
+"""
+import bisect
+import heapq
+import html
+import re
+import unicodedata
+from collections import Counter
+
+_NON_ALNUM = re.compile(r'[^a-z0-9]+')
+
+# Searchable fields: (name, record keys holding the text, score weight)
+SEARCH_FIELDS = (
+    ('name', ('name', 'Name'), 1.0),
+    ('team', ('team', 'Current School', 'club'), 0.8),
+    ('hometown', ('hometown',), 0.6),
+)
+
+# Minimum share of the query trigrams a value must contain to be a match
+MIN_COVERAGE = 0.5
+
+
+def normalize_text(value):
+    """Lowercase ASCII words: 'Krist&oacute;fer Örn' -> 'kristofer orn'"""
+    if not value:
+        return ''
+    value = unicodedata.normalize('NFKD', html.unescape(str(value)))
+    value = ''.join(ch for ch in value if not unicodedata.combining(ch))
+    return _NON_ALNUM.sub(' ', value.lower()).strip()
+
+
+def trigrams(text):
+    """Set of padded word trigrams of already normalized text"""
+    grams = set()
+    for word in text.split():
+        padded = f' {word} '
+        for i in range(len(padded) - 2):
+            grams.add(padded[i:i + 3])
+    return grams
+
+
+def field_text(p, keys):
+    for key in keys:
+        value = p.get(key)
+        if value and value != 'N/A':
+            return normalize_text(value)
+    return ''
+
+
+class TrigramIndex:
+    """
+    Inverted index trigram -> distinct field values, per searchable field.
+
+    Each distinct value (a team name shared by 30 players is indexed once)
+    keeps the rows it came from. A query scores values by how many of its
+    trigrams they contain, weighted by field, and returns the best rows.
+    """
+
+    def __init__(self, players):
+        self.fields = []
+        for name, keys, weight in SEARCH_FIELDS:
+            value_ids = {}
+            value_rows = []
+            value_sizes = []
+            postings = {}
+            for row, p in enumerate(players):
+                text = field_text(p, keys)
+                if not text:
+                    continue
+                value_id = value_ids.get(text)
+                if value_id is None:
+                    value_id = value_ids[text] = len(value_rows)
+                    value_rows.append([])
+                    grams = trigrams(text)
+                    value_sizes.append(len(grams))
+                    for gram in grams:
+                        postings.setdefault(gram, []).append(value_id)
+                value_rows[value_id].append(row)
+            self.fields.append((name, weight, postings, value_rows, value_sizes))
+
+    def search(self, query, limit=20, allowed=None):
+        """
+        Return [(row, score)] for the best `limit` matches of `query`, best first.
+
+        `allowed`, if given, is a boolean mask of allowed rows (e.g. from
+        PlayerTable.mask() for the active filters).
+        Scores are in (0, 1]: mostly query coverage, with a small bonus for
+        values close in length to the query so exact matches rank first.
+        """
+        query_grams = trigrams(normalize_text(query))
+        if not query_grams:
+            return []
+
+        best = {}
+        for _, weight, postings, value_rows, value_sizes in self.fields:
+            shared = Counter()
+            for gram in query_grams:
+                posting = postings.get(gram)
+                if posting:
+                    shared.update(posting)
+            for value_id, count in shared.items():
+                coverage = count / len(query_grams)
+                if coverage < MIN_COVERAGE:
+                    continue
+                dice = 2 * count / (len(query_grams) + value_sizes[value_id])
+                score = weight * (0.8 * coverage + 0.2 * dice)
+                for row in value_rows[value_id]:
+                    if allowed is not None and not allowed[row]:
+                        continue
+                    if score > best.get(row, 0):
+                        best[row] = score
+
+        # Ties are broken by row id so results are deterministic
+        top = heapq.nsmallest(limit, best.items(), key=lambda item: (-item[1], item[0]))
+        return [(row, round(score, 4)) for row, score in top]
+
+
+# Autocomplete kinds: (record keys holding the value) for each kind
+AUTOCOMPLETE_KINDS = {
+    'name': ('name', 'Name'),
+    'team': ('team', 'Current School'),
+    'club': ('club',),
+    'league': ('league', 'Division Transferring From'),
+}
+
+# Completions kept per prefix, i.e. the largest limit autocomplete accepts
+MAX_COMPLETIONS = 25
+
+# Prefixes up to this length have their completions precomputed; longer
+# prefixes only cover a handful of keys and are ranked on the fly
+PRECOMPUTED_PREFIX_LENGTH = 3
+
+
+class PrefixIndex:
+    """
+    Sorted-array prefix index with precomputed top completions.
+
+    Every distinct value is reachable from the start of each of its words, so
+    "mont" suggests "Juan Jose Montoya". Keys live in one sorted list searched
+    with bisect. Short prefixes, which match thousands of keys, have their
+    best MAX_COMPLETIONS precomputed like the upper nodes of a trie.
+    """
+
+    def __init__(self, values):
+        """`values` maps display value -> weight (e.g. number of players)"""
+        self.values = sorted(values)
+        self.weights = [values[value] for value in self.values]
+
+        keyed = []
+        for value_id, value in enumerate(self.values):
+            words = normalize_text(value).split()
+            for i in range(len(words)):
+                keyed.append((' '.join(words[i:]), value_id))
+        keyed.sort()
+        self.keys = [key for key, _ in keyed]
+        self.key_values = [value_id for _, value_id in keyed]
+
+        self.top = {}
+        for length in range(1, PRECOMPUTED_PREFIX_LENGTH + 1):
+            prefixes = {key[:length] for key in self.keys if len(key) >= length}
+            for prefix in prefixes:
+                self.top[prefix] = self._rank(prefix, MAX_COMPLETIONS)
+
+    @classmethod
+    def from_players(cls, players, keys):
+        """Index the distinct values of the first present key, weighted by player count"""
+        counts = Counter()
+        for p in players:
+            for key in keys:
+                value = p.get(key)
+                if value and value != 'N/A':
+                    counts[html.unescape(str(value)).strip()] += 1
+                    break
+        return cls(counts)
+
+    def _rank(self, prefix, limit):
+        lo = bisect.bisect_left(self.keys, prefix)
+        hi = bisect.bisect_left(self.keys, prefix + '\uffff')
+        value_ids = set(self.key_values[lo:hi])
+        # Most common first, alphabetical among equals (values are sorted)
+        return heapq.nsmallest(limit, value_ids, key=lambda value_id: (-self.weights[value_id], value_id))
+
+    def complete(self, prefix, limit=10):
+        """Return [(value, weight)] for the best `limit` completions of `prefix`"""
+        prefix = normalize_text(prefix)
+        if not prefix:
+            return []
+        value_ids = self.top.get(prefix)
+        if value_ids is None:
+            value_ids = self._rank(prefix, limit)
+        return [(self.values[value_id], self.weights[value_id]) for value_id in value_ids[:limit]]
@@ -0,0 +1,122 @@
+"""
+Columnar view of the player catalog.
+
+PlayerTable stores the filterable fields of every player as NumPy arrays:
+categorical fields (type, league, position...) as integer codes, NJCAA stats
+as integers. Filters, facet counts and sort ranks are then vectorized array
+operations instead of Python loops over dicts, so their cost stays flat as
+more leagues are loaded.
+"""
+import numpy as np
+
+# Code of rows that have no value for a categorical field / a stat
+MISSING = -1
+
+
+def parse_stat(value):
+    """Stat value as a non-negative int, or MISSING"""
+    if value is None or value == '':
+        return MISSING
+    try:
+        value = int(float(value))
+    except (TypeError, ValueError):
+        return MISSING
+    return value if value >= 0 else MISSING
+
+
+class PlayerTable:
+    """
+    Column arrays aligned with the snapshot's rows.
+
+    `categorical` maps field -> normalize function (or None) applied to both
+    the stored values and looked-up filter values. `stats` lists the numeric
+    fields parsed with parse_stat().
+    """
+
+    def __init__(self, players, categorical, stats):
+        self.size = len(players)
+        self.normalizers = dict(categorical)
+        self.codes = {}
+        self.categories = {}
+        self.labels = {}
+        for field, normalize in categorical.items():
+            lookup = {}
+            labels = []
+            codes = np.full(self.size, MISSING, dtype=np.int32)
+            for row, p in enumerate(players):
+                label = value = p.get(field)
+                if normalize is not None:
+                    value = normalize(value)
+                elif value is None:
+                    continue
+                code = lookup.get(value)
+                if code is None:
+                    # The first spelling seen of a normalized value is its label
+                    code = lookup[value] = len(labels)
+                    labels.append(label)
+                codes[row] = code
+            self.codes[field] = codes
+            self.categories[field] = lookup
+            self.labels[field] = labels
+
+        self.stats = {
+            stat: np.fromiter((parse_stat(p.get(stat)) for p in players), dtype=np.int32, count=self.size)
+            for stat in stats
+        }
+
+    @classmethod
+    def from_columns(cls, size, categorical, categories, codes, stats):
+        """
+        Table over columns built earlier (e.g. arrays read in place from a
+        compiled catalog). `categories` maps field -> [(value, label)] in code
+        order, `codes` and `stats` map field -> column array of `size` rows.
+        """
+        table = cls.__new__(cls)
+        table.size = size
+        table.normalizers = dict(categorical)
+        table.codes = dict(codes)
+        table.categories = {field: {value: code for code, (value, _) in enumerate(pairs)} for field, pairs in categories.items()}
+        table.labels = {field: [label for _, label in pairs] for field, pairs in categories.items()}
+        table.stats = dict(stats)
+        return table
+
+    def code(self, field, value):
+        """Code of a filter value, None if no row has it"""
+        normalize = self.normalizers[field]
+        if normalize is not None:
+            value = normalize(value)
+        return self.categories[field].get(value)
+
+    def mask(self, filters):
+        """
+        Boolean mask of the rows matching every filter.
+
+        Categorical fields take a value, stats an inclusive (min, max) range
+        where either bound may be None.
+        """
+        mask = np.ones(self.size, dtype=bool)
+        for field, value in filters.items():
+            if field in self.stats:
+                minimum, maximum = value
+                column = self.stats[field]
+                # Missing stats are negative, so they never pass the lower bound
+                mask &= column >= (minimum or 0)
+                if maximum is not None:
+                    mask &= column <= maximum
+            else:
+                code = self.code(field, value)
+                if code is None:
+                    return np.zeros(self.size, dtype=bool)
+                mask &= self.codes[field] == code
+        return mask
+
+    def counts(self, field, mask=None):
+        """
+        Return [(value, label, count)] of `field` values among the rows in
+        `mask`; value is the normalized value, label its first spelling.
+        """
+        codes = self.codes[field] if mask is None else self.codes[field][mask]
+        counts = np.bincount(codes[codes != MISSING], minlength=len(self.labels[field]))
+        labels = self.labels[field]
+        values = list(self.categories[field])
+        return [(values[code], labels[code], int(count)) for code, count in enumerate(counts) if count]
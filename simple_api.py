@@ -1,12 +1,33 @@
+"""
+Read-only catalog service.
+
+Serves the player catalog, search, facets, autocomplete and team logos from
+the prebuilt snapshot (see compiled_catalog.py), without the Stripe, Supabase,
+YouTube or SMTP code of api.py, so read traffic can run on small instances:
+
+    gunicorn -c gunicorn.conf.py simple_api:app
+
+Claims made since the snapshot was built are not visible here; writes, chat
+and payments stay on api.py.
+"""
 from flask import Flask, request, jsonify
-import json
-import os
-import requests
 from flask_cors import CORS
 
+from catalog_api import catalog_api, init_catalog_api
+from player_catalog import PlayerCatalog, load_static_players
+
 app = Flask(__name__)
 CORS(app, origins=['https://aiscoutingassistant.vercel.app', 'http://localhost:5173'])
 
+def build_static_player_list():
+    """Every player shipped with the repo, in the same order as api.py"""
+    claimed, unclaimed, highschool = load_static_players()
+    return claimed + unclaimed + highschool
+
+player_catalog = PlayerCatalog(build_static_player_list)
+init_catalog_api(app, player_catalog)
+app.register_blueprint(catalog_api)
+
 @app.route('/', methods=['GET'])
 def root():
     """Root endpoint for testing"""
@@ -15,6 +36,13 @@ def root():
         'status': 'healthy',
         'endpoints': [
             '/api/health',
+            '/api/players',
+            '/api/players/<id>',
+            '/api/players/batch',
+            '/api/players/search',
+            '/api/players/facets',
+            '/api/autocomplete',
+            '/api/team-logos',
             '/api/youtube-highlights'
         ]
     })
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Regression test for the claims broadcast between workers.
+
+A second Python process plays the worker that handled a claim: it publishes
+patches, and this process must read them back in order on its next poll,
+without either side seeing its own writes. Run with
+`python test_catalog_broadcast.py` or pytest.
+"""
+
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+from catalog_broadcast import BROADCAST_AVAILABLE, CatalogBroadcast
+
+PUBLISHER = """
+import json, sys
+import catalog_broadcast
+catalog_broadcast.JOURNAL_MAX_BYTES = int(sys.argv[2])
+broadcast = catalog_broadcast.CatalogBroadcast(sys.argv[1])
+for player_id in sys.argv[3:]:
+    broadcast.publish([{'playerId': player_id, 'claimed': True}])
+print(json.dumps(broadcast.poll()))
+"""
+
+
+def publish_from_other_process(path, player_ids, journal_max_bytes=1024 * 1024):
+    """Publish one patch per id from a fresh process; returns that process's own poll()"""
+    result = subprocess.run(
+        [sys.executable, '-c', PUBLISHER, path, str(journal_max_bytes)] + list(player_ids),
+        capture_output=True, text=True, timeout=60,
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+    )
+    assert result.returncode == 0, result.stderr
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def polled_ids(result):
+    profiles, missed = result
+    return [p['playerId'] for p in profiles], missed
+
+
+def test_publish_reaches_other_workers_once():
+    """Patches from another process arrive in order; nobody polls back its own writes"""
+    if not BROADCAST_AVAILABLE:
+        return
+    path = os.path.join(tempfile.mkdtemp(), 'generation')
+    worker = CatalogBroadcast(path)
+    assert worker.poll() is None
+
+    assert publish_from_other_process(path, ['1', '2']) is None
+    assert polled_ids(worker.poll()) == (['1', '2'], False)
+    assert worker.poll() is None
+
+    # This worker's own patch isn't handed back to it, later ones still are
+    worker.publish([{'playerId': '3', 'claimed': True}])
+    assert worker.poll() is None
+    assert publish_from_other_process(path, ['4']) is None
+    assert polled_ids(worker.poll()) == (['4'], False)
+
+
+def test_truncated_journal_reports_missed_entries():
+    """Entries lost to a journal truncation are reported so the worker reloads"""
+    if not BROADCAST_AVAILABLE:
+        return
+    path = os.path.join(tempfile.mkdtemp(), 'generation')
+    worker = CatalogBroadcast(path)
+    assert worker.poll() is None
+
+    # Room for about two entries: the third publish starts a new journal
+    assert publish_from_other_process(path, ['1', '2', '3'], journal_max_bytes=200) is None
+    ids, missed = polled_ids(worker.poll())
+    assert missed and ids == ['3']
+    assert worker.poll() is None
+
+
+if __name__ == "__main__":
+    test_publish_reaches_other_workers_once()
+    test_truncated_journal_reports_missed_entries()
+    print("✅ Catalog broadcast tests passed")
@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""
+Tests for the incremental claimed_profiles sync.
+
+requests.get is replaced by a fake PostgREST endpoint that honours the
+updated_at filter, the order and the Range header, so paging, the gte.
+high-water mark and the periodic full sync can be checked without Supabase.
+Run with `python test_claimed_profile_sync.py` or pytest.
+"""
+
+from contextlib import contextmanager
+from unittest import mock
+
+import claimed_profile_sync
+from claimed_profile_sync import CLAIMED_PROFILE_COLUMNS, ClaimedProfilesSync
+
+
+def make_row(n, updated_at, **columns):
+    row = {column: None for column in CLAIMED_PROFILE_COLUMNS}
+    row.update(
+        id=n, original_player_id=f'njcaa-{n}', claimed_by_user_id=f'user-{n}', name=f'Player {n}',
+        position='F', current_school='Otero College', claimed_at='2025-01-01T00:00:00+00:00',
+        updated_at=updated_at,
+    )
+    row.update(columns)
+    return row
+
+
+class FakeResponse:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return self.rows
+
+
+class FakeClaimedProfiles:
+    """The claimed_profiles table behind GET /rest/v1/claimed_profiles"""
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.requests = []
+
+    def get(self, url, params=None, headers=None, timeout=None):
+        self.requests.append((params.get('updated_at'), headers['Range']))
+        rows = sorted(self.rows, key=lambda row: (row['updated_at'], row['id']))
+        since = params.get('updated_at')
+        if since is not None:
+            assert since.startswith('gte.')
+            rows = [row for row in rows if row['updated_at'] >= since[len('gte.'):]]
+        first, last = (int(bound) for bound in headers['Range'].split('-'))
+        return FakeResponse(rows[first:last + 1])
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+
+@contextmanager
+def fake_supabase(table, clock):
+    """A ClaimedProfilesSync reading `table`, with 2-row pages and `clock` as its time"""
+    with mock.patch.object(claimed_profile_sync.requests, 'get', table.get), \
+            mock.patch.object(claimed_profile_sync, 'PAGE_SIZE', 2), \
+            mock.patch.object(claimed_profile_sync, 'time', clock):
+        yield ClaimedProfilesSync('https://example.supabase.co', 'key', timeout=5, full_sync_interval=3600)
+
+
+def test_pages_until_a_short_page():
+    """Range pages of PAGE_SIZE rows are requested until one comes back short"""
+    clock = Clock()
+    for count, expected_ranges in ((5, ['0-1', '2-3', '4-5']), (4, ['0-1', '2-3', '4-5']), (0, ['0-1'])):
+        table = FakeClaimedProfiles([make_row(n, f'2025-03-0{n + 1}T00:00:00+00:00') for n in range(count)])
+        with fake_supabase(table, clock) as sync:
+            assert len(sync.sync()) == count
+            assert [page_range for _, page_range in table.requests] == expected_ranges
+
+
+def test_delta_sync_from_high_water_mark():
+    """Deltas start at gte.<newest updated_at>, replace changed profiles and keep the rest"""
+    clock = Clock()
+    table = FakeClaimedProfiles([make_row(n, f'2025-03-0{n + 1}T00:00:00+00:00') for n in range(3)])
+    with fake_supabase(table, clock) as sync:
+        sync.sync()
+        assert table.requests[0][0] is None
+        assert sync.high_water == '2025-03-03T00:00:00+00:00'
+
+        # One profile edited, one claimed, both after the high-water mark
+        table.rows[0] = make_row(0, '2025-03-05T00:00:00+00:00', name='Renamed Player')
+        table.rows.append(make_row(3, '2025-03-04T00:00:00+00:00'))
+        table.requests.clear()
+        clock.now += 60
+        profiles = {p['playerId']: p for p in sync.sync()}
+        assert table.requests[0][0] == 'gte.2025-03-03T00:00:00+00:00'
+        assert sorted(profiles) == ['njcaa-0', 'njcaa-1', 'njcaa-2', 'njcaa-3']
+        assert profiles['njcaa-0']['Name'] == 'Renamed Player'
+        assert sync.high_water == '2025-03-05T00:00:00+00:00'
+
+        # Nothing new: the row at the mark is fetched again and changes nothing
+        table.requests.clear()
+        clock.now += 60
+        assert len(sync.sync()) == 4
+        assert table.requests == [('gte.2025-03-05T00:00:00+00:00', '0-1')]
+
+
+def test_failed_delta_leaves_overlay_untouched():
+    """A row that can't be converted fails the whole delta, nothing is half-applied"""
+    clock = Clock()
+    table = FakeClaimedProfiles([make_row(n, f'2025-03-0{n + 1}T00:00:00+00:00') for n in range(2)])
+    with fake_supabase(table, clock) as sync:
+        sync.sync()
+        profiles, high_water = dict(sync.profiles), sync.high_water
+
+        table.rows[0] = make_row(0, '2025-03-05T00:00:00+00:00', name='Renamed Player')
+        broken = make_row(2, '2025-03-06T00:00:00+00:00')
+        del broken['current_school']
+        table.rows.append(broken)
+        clock.now += 60
+        try:
+            sync.sync()
+            assert False, 'sync() should raise on a malformed row'
+        except KeyError:
+            pass
+        assert sync.profiles == profiles and sync.high_water == high_water
+
+
+def test_full_sync_interval_drops_deleted_profiles():
+    """Deletes only show up on the periodic full sync, which re-reads every row"""
+    clock = Clock()
+    table = FakeClaimedProfiles([make_row(n, f'2025-03-0{n + 1}T00:00:00+00:00') for n in range(3)])
+    with fake_supabase(table, clock) as sync:
+        sync.sync()
+        del table.rows[1]
+
+        clock.now += 3599
+        assert len(sync.sync()) == 3
+
+        table.requests.clear()
+        clock.now += 1
+        assert sorted(p['playerId'] for p in sync.sync()) == ['njcaa-0', 'njcaa-2']
+        assert table.requests[0][0] is None
+
+
+if __name__ == "__main__":
+    test_pages_until_a_short_page()
+    test_delta_sync_from_high_water_mark()
+    test_failed_delta_leaves_overlay_untouched()
+    test_full_sync_interval_drops_deleted_profiles()
+    print("✅ Claimed profile sync tests passed")
@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+"""
+Import-time budget for api.py.
+
+Every gunicorn worker (or the master, with preload) pays for importing api.py
+on boot, so heavy dependencies must only load on first use of the endpoint
+that needs them. Run with `python test_import_time.py` or pytest.
+"""
+
+import json
+import os
+import subprocess
+import sys
+
+# Budget for `import api` in a fresh interpreter, in milliseconds
+IMPORT_BUDGET_MS = float(os.getenv('IMPORT_BUDGET_MS', '1000'))
+
+# Modules that must not be imported until their endpoint is used
+LAZY_MODULES = ['pandas', 'stripe', 'googleapiclient', 'smtplib', 'email.mime.multipart']
+
+PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import api
+elapsed = (time.perf_counter() - start) * 1000
+print(json.dumps({'ms': elapsed, 'modules': sorted(sys.modules)}))
+"""
+
+
+def import_api():
+    """Import api.py in a fresh interpreter, returning (milliseconds, loaded module names)"""
+    result = subprocess.run(
+        [sys.executable, '-c', PROBE],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        capture_output=True, text=True, check=True
+    )
+    data = json.loads(result.stdout.strip().splitlines()[-1])
+    return data['ms'], set(data['modules'])
+
+
+def test_import_time():
+    """`import api` stays within the budget and leaves heavy modules unloaded"""
+    elapsed, modules = import_api()
+    print(f"import api: {elapsed:.0f}ms (budget {IMPORT_BUDGET_MS:.0f}ms)")
+
+    loaded = [name for name in LAZY_MODULES if name in modules]
+    assert not loaded, f"imported at boot: {', '.join(loaded)}"
+    assert elapsed <= IMPORT_BUDGET_MS, f"import api took {elapsed:.0f}ms, budget is {IMPORT_BUDGET_MS:.0f}ms"
+
+
+if __name__ == "__main__":
+    test_import_time()
+    print("✅ Import time within budget")
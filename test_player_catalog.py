@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+"""
+Regression tests for the claims overlay of the player catalog.
+
+CatalogSnapshot.page() merges overlay records into the presorted base
+positions (sorted in process, or read from a compiled catalog), and
+PlayerCatalog.patch() carries cached responses over to the next snapshot.
+Both are checked against the obvious slow version on a small synthetic
+catalog. Run with `python test_player_catalog.py` or pytest.
+"""
+
+import json
+import os
+import random
+import tempfile
+
+from flask import Flask
+
+from catalog_api import catalog_api, init_catalog_api
+from compiled_catalog import CompiledCatalog, write_compiled_catalog
+from player_catalog import (SORT_FIELDS, CatalogBase, PlayerCatalog, SortKeys, assign_player_id, encode_record,
+                            player_key, sort_key, sort_value)
+from player_table import MISSING, parse_stat
+
+STATS = ('goals', 'assists', 'points', 'games', 'games_started', 'minutes')
+
+
+def make_players(count=300, seed=7):
+    """
+    NJCAA-like records with many ties and missing values, plus high school
+    ones without a playerId, some identical, given ids as read_static_players() does
+    """
+    rng = random.Random(seed)
+    players = []
+    for i in range(count):
+        p = {
+            'playerId': str(1000 + i),
+            'claimed': False,
+            'type': 'transfer',
+            'source': 'json',
+            'name': rng.choice(['Alex Ray', 'Ben Cole', 'Cris Diaz', 'Dan Eze', '']),
+            'team': rng.choice(['Otero College', 'Yavapai College', 'Monroe University', '']),
+            'league': rng.choice(['NJCAA Division 1', 'NJCAA Division 2']),
+            'position': rng.choice(['F', 'MF', 'D', 'GK', '']),
+            'year': rng.choice(['Fr', 'So', '']),
+        }
+        for stat in STATS:
+            p[stat] = rng.choice(['0', '1', '2', '7', '', None])
+        players.append(p)
+    for i in range(count // 10):
+        players.append({
+            'claimed': False, 'type': 'highschool', 'source': 'json',
+            'name': rng.choice(['Eli Fox', 'Gus Hall']), 'club': rng.choice(['FC Dallas', 'Solar SC']),
+            'position': rng.choice(['F', 'D']), 'grad_year': rng.choice(['2025', '2026']), 'state': 'TX',
+        })
+    derived_ids = set()
+    for p in players:
+        assign_player_id(p, derived_ids)
+    return players
+
+
+def make_claims(players, seed=11):
+    """Claims shadowing some base records (with other names and teams) and claims of new ids"""
+    rng = random.Random(seed)
+    claims = []
+    for p in rng.sample([p for p in players if p['type'] == 'transfer'], 25):
+        claims.append({
+            'playerId': p['playerId'], 'claimed': True, 'type': 'transfer', 'source': 'database',
+            'Name': rng.choice(['Alex Ray', 'Zed Young', 'Cris Diaz']),
+            'Current School': rng.choice(['Otero College', 'Zion College']),
+            'Position': rng.choice(['F', 'D']), 'Division Transferring From': 'NJCAA Division 1',
+        })
+    for i in range(5):
+        claims.append({
+            'playerId': str(9000 + i), 'claimed': True, 'type': 'transfer', 'source': 'database',
+            'Name': 'Alex Ray', 'Current School': 'Otero College', 'Position': 'F',
+        })
+    return claims
+
+
+def expected_order(snapshot, rows, sort):
+    """`rows` ordered the slow way: sort_key() of every record, then reversed for descending"""
+    descending = sort.startswith('-')
+    field = sort.lstrip('-')
+
+    def key(row):
+        p = snapshot.record(row)
+        if field in STATS:
+            value = parse_stat(p.get(field))
+            value = None if value == MISSING else value
+        else:
+            value = sort_value(p, field)
+        return sort_key(value, player_key(p), field, descending)
+
+    ordered = sorted(rows, key=key)
+    return ordered[::-1] if descending else ordered
+
+
+def walk_pages(snapshot, rows, sort, limit):
+    """Every row reached by following next keys from the first page"""
+    seen = []
+    after = None
+    while True:
+        page_rows, after = snapshot.page(rows, sort, limit=limit, after=after)
+        seen.extend(page_rows)
+        if after is None:
+            return seen
+
+
+def check_paging(players, claims):
+    catalog = PlayerCatalog(lambda: players)
+    catalog.set_overlay(claims)
+    snapshot = catalog.snapshot()
+    assert len(snapshot.overlay) == 30 and len(snapshot.hidden) == 25
+
+    for filters in ({}, {'position': 'F'}, {'type': 'transfer', 'goals': (1, None)}):
+        rows = snapshot.select(filters).tolist()
+        for field in SORT_FIELDS:
+            for sort in (field, '-' + field):
+                expected = expected_order(snapshot, rows, sort)
+                page_rows, next_key = snapshot.page(rows, sort)
+                assert page_rows == expected and next_key is None, (filters, sort)
+                for limit in (1, 7, 50):
+                    assert walk_pages(snapshot, rows, sort, limit) == expected, (filters, sort, limit)
+    return snapshot
+
+
+def test_overlay_paging_matches_naive_sort():
+    """Merged base + overlay pages, with and without cursors, match a plain sort"""
+    players = make_players()
+    check_paging(players, make_claims(players))
+
+
+def test_compiled_indexes_page_like_in_process_ones():
+    """A base over a compiled catalog reads its sort orders from the file and pages the same"""
+    players = make_players()
+    directory = tempfile.mkdtemp()
+    source = os.path.join(directory, 'players.json')
+    with open(source, 'w') as f:
+        json.dump(players, f)
+    path = os.path.join(directory, 'catalog.bin')
+    base = CatalogBase(0, players)
+    groups = ([], base.players[:300], base.players[300:])
+    write_compiled_catalog(path, groups, [None], encode_record, [source], base.index_sections())
+
+    compiled = [p for group in CompiledCatalog(path).players() for p in group]
+    snapshot = check_paging(compiled, make_claims(players))
+    assert isinstance(snapshot.base.sort_order('name', False)[0], SortKeys)
+
+
+def make_app(catalog):
+    app = Flask(__name__)
+    init_catalog_api(app, catalog)
+    app.register_blueprint(catalog_api)
+    return app.test_client()
+
+
+CACHED_URLS = [
+    '/api/players',
+    '/api/players?type=transfer&position=D',
+    '/api/players?type=highschool',
+    '/api/players?league=NJCAA Division 2&sort=-goals&limit=10',
+    '/api/players?position=F&sort=name&limit=5&view=card',
+    '/api/players/search?q=alex ray',
+    '/api/players/search?q=eli&type=highschool',
+    '/api/players/facets',
+    '/api/players/facets?type=highschool',
+]
+
+
+def test_patch_carries_over_only_unaffected_responses():
+    """After patch(), every response equals the one a freshly built catalog gives"""
+    players = make_players()
+    claims = make_claims(players)
+    catalog = PlayerCatalog(lambda: players)
+    catalog.set_overlay(claims)
+    client = make_app(catalog)
+    for url in CACHED_URLS:
+        assert client.get(url).status_code == 200, url
+    cached = len(catalog.snapshot().responses)
+
+    # One claim edited (moves from D to F), one new claim of a base record
+    edited = dict(claims[0], Position='F', Name='Zed Young')
+    base_record = next(p for p in players if p['type'] == 'transfer' and p['playerId'] not in {c['playerId'] for c in claims})
+    new_claim = {
+        'playerId': base_record['playerId'], 'claimed': True, 'type': 'transfer', 'source': 'database',
+        'Name': 'Ben Cole', 'Current School': 'Yavapai College', 'Position': 'D',
+    }
+    catalog.patch([edited, new_claim])
+    carried = len(catalog.snapshot().responses)
+    assert 0 < carried < cached, (carried, cached)
+
+    fresh = PlayerCatalog(lambda: players)
+    fresh.set_overlay(list(catalog.snapshot().overlay))
+    fresh_client = make_app(fresh)
+    for url in CACHED_URLS:
+        assert client.get(url).data == fresh_client.get(url).data, url
+
+    # Setting the same overlay again changes nothing and keeps the cache
+    snapshot = catalog.snapshot()
+    catalog.set_overlay(list(snapshot.overlay))
+    assert catalog.snapshot() is snapshot
+
+
+if __name__ == "__main__":
+    test_overlay_paging_matches_naive_sort()
+    test_compiled_indexes_page_like_in_process_ones()
+    test_patch_carries_over_only_unaffected_responses()
+    print("✅ Catalog overlay tests passed")